@@ -0,0 +1,105 @@
+"""
+Adaptive per-call batch sizing driven by truncation and parse yield
+"""
+
+import math
+import threading
+from typing import Dict, Any, Optional
+
+from llm_providers import GenerationResult
+
+
+class AdaptiveBatchController:
+    """
+    Picks how many sets to request per call (and the max_tokens to allow)
+    from what earlier calls actually produced
+
+    The controller keeps a running estimate of output tokens per conversation
+    set. It then requests as many sets as fit in max_tokens with some headroom,
+    and raises max_tokens (up to a ceiling) when that allows more sets per call.
+    A call that hits max_tokens shrinks the next request straight away.
+    """
+
+    def __init__(self, batch_size: int, max_tokens: int,
+                 min_batch_size: int = 1, max_batch_size: Optional[int] = None,
+                 max_tokens_ceiling: Optional[int] = None,
+                 headroom: float = 0.85, smoothing: float = 0.3):
+        """
+        Initialize the controller
+
+        Args:
+            batch_size: Sets to request before anything has been observed
+            max_tokens: Configured max_tokens; the controller never goes below it
+            min_batch_size: Fewest sets to request per call
+            max_batch_size: Most sets to request per call
+            max_tokens_ceiling: Highest max_tokens the controller may use
+            headroom: Fraction of max_tokens the requested sets are expected to fill
+            smoothing: Weight of the newest observation in the tokens-per-set average
+        """
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size or batch_size)
+        self.base_max_tokens = max_tokens
+        self.max_tokens_ceiling = max(max_tokens, max_tokens_ceiling or max_tokens)
+        self.headroom = headroom
+        self.smoothing = smoothing
+
+        self.batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+        self.max_tokens = max_tokens
+        self.tokens_per_set: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['AdaptiveBatchController']:
+        """Create a controller from generation.adaptive_batching, or None if it is disabled"""
+        adaptive_config = config['generation'].get('adaptive_batching') or {}
+        if not adaptive_config.get('enabled', False):
+            return None
+        return cls(
+            batch_size=config['generation']['batch_size'],
+            max_tokens=config['llm']['max_tokens'],
+            min_batch_size=adaptive_config.get('min_batch_size', 1),
+            max_batch_size=adaptive_config.get('max_batch_size'),
+            max_tokens_ceiling=adaptive_config.get('max_tokens_ceiling')
+        )
+
+    def observe(self, requested: int, parsed: int, result: GenerationResult, retry: bool = False):
+        """
+        Update the sizing from one finished call
+
+        Args:
+            requested: Number of sets the call asked for
+            parsed: Number of complete sets parsed from the output
+            result: The provider result of the call
+            retry: Whether the call only asked for the sets an earlier call did not
+                return; its size says nothing about how many sets fit, so it only
+                feeds the tokens-per-set estimate
+        """
+        with self._lock:
+            if result.output_tokens and (parsed or result.truncated):
+                # A truncated call also spent tokens on the set it did not finish
+                sets_paid_for = parsed + 0.5 if result.truncated else parsed
+                sample = result.output_tokens / sets_paid_for
+                if self.tokens_per_set is None:
+                    self.tokens_per_set = sample
+                else:
+                    self.tokens_per_set += self.smoothing * (sample - self.tokens_per_set)
+
+            if self.tokens_per_set is None:
+                # No usage data: step the current size by one set based on the outcome alone
+                if retry:
+                    return
+                if result.truncated:
+                    self.batch_size = max(self.min_batch_size, min(self.batch_size, requested - 1))
+                elif parsed >= requested:
+                    self.batch_size = min(self.max_batch_size, max(self.batch_size, requested + 1))
+                return
+
+            # Allow enough tokens for the largest batch, within the ceiling
+            wanted_tokens = math.ceil(self.max_batch_size * self.tokens_per_set / self.headroom)
+            self.max_tokens = min(self.max_tokens_ceiling, max(self.base_max_tokens, wanted_tokens))
+
+            fits = int(self.max_tokens * self.headroom // self.tokens_per_set)
+            batch_size = min(self.max_batch_size, max(self.min_batch_size, fits))
+            if result.truncated and not retry:
+                batch_size = min(batch_size, max(self.min_batch_size, requested - 1))
+            self.batch_size = batch_size
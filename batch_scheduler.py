@@ -0,0 +1,185 @@
+"""
+Batch scheduling shared by the threaded, sequential and async generation loops
+"""
+
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from run_journal import RunJournal
+
+
+class ScheduledBatch(NamedTuple):
+    """One batch and the block of output indices reserved for it"""
+
+    number: int
+    start_index: int
+    size: int
+
+
+class BatchScheduler:
+    """
+    Hands out batches until the requested total is reached
+
+    Every batch reserves its index block in the run journal before it starts,
+    so batches finishing out of order (or short) never write to the same file.
+    With one batch at a time, the unused indices of a short batch go to the
+    next one instead.
+
+    Batches that save nothing are paid for all the same, so after one the
+    scheduler backs off exponentially, runs a single batch at a time, reuses
+    the empty block's indices, and stops the run once max_failed_batches
+    batches in a row came back empty.
+    """
+
+    def __init__(self, journal: RunJournal, total_sets: int, completed_files: List[str], next_index: int,
+                 batch_size: Callable[[], int], max_concurrency: int = 1,
+                 max_failed_batches: int = 5, failure_backoff: float = 5.0, max_backoff: float = 300.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            journal: Journal that records reservations and completed batches
+            total_sets: Number of sets the run should end up with
+            completed_files: Files already generated by an interrupted run
+            next_index: First free output index
+            batch_size: Returns the number of sets to request in the next batch
+            max_concurrency: Most batches in flight at once
+            max_failed_batches: Batches in a row that may save nothing before the run stops (0 = never stop)
+            failure_backoff: Seconds to wait after an empty batch, doubled for each further one
+            max_backoff: Longest wait between batches while they keep coming back empty
+        """
+        self.journal = journal
+        self.total_sets = total_sets
+        self.all_files = list(completed_files)
+        self.next_index = next_index
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_failed_batches = max_failed_batches
+        self.failure_backoff = failure_backoff
+        self.max_backoff = max_backoff
+        self.batch_count = 0
+        self.failed_streak = 0  # Batches in a row that saved nothing
+        self.stopped = False
+        self.free_blocks: List[Tuple[int, int]] = []  # (start index, size) of empty batches' blocks
+        self._resume_at = 0.0
+
+    @property
+    def generated(self) -> int:
+        return len(self.all_files)
+
+    @property
+    def finished(self) -> bool:
+        return self.stopped or self.generated >= self.total_sets
+
+    def backoff_remaining(self) -> float:
+        """Seconds to wait before the next batch may start"""
+        return max(0.0, self._resume_at - time.monotonic())
+
+    def reserve(self, in_flight: List[ScheduledBatch]) -> List[ScheduledBatch]:
+        """Start as many batches as fit next to the ones in flight without requesting more than is missing"""
+        if self.stopped or self.backoff_remaining():
+            return []
+        # While batches keep failing, probe with one batch instead of paying for several
+        concurrency = 1 if self.failed_streak else self.max_concurrency
+        pending = sum(batch.size for batch in in_flight)
+        batches = []
+        while len(in_flight) + len(batches) < concurrency and self.generated + pending < self.total_sets:
+            self.batch_count += 1
+            size = min(self.batch_size(), self.total_sets - self.generated - pending)
+            if self.free_blocks:
+                start_index, free = self.free_blocks.pop(0)
+                size = min(size, free)
+                if size < free:
+                    self.free_blocks.insert(0, (start_index + size, free - size))
+            else:
+                start_index = self.next_index
+                self.next_index += size
+            batch = ScheduledBatch(self.batch_count, start_index, size)
+            if self.max_concurrency > 1:
+                print(f"\nBatch {batch.number}: Generating {batch.size} sets "
+                      f"(indices {batch.start_index}-{batch.start_index + batch.size - 1})...")
+            else:
+                print(f"\nBatch {batch.number}: Generating {batch.size} sets...")
+            self.journal.record_reservation(batch.start_index, batch.size)
+            batches.append(batch)
+            pending += batch.size
+        return batches
+
+    def complete(self, batch: ScheduledBatch, batch_files: List[str]):
+        """Record the files a finished batch saved"""
+        next_index = batch.start_index + batch.size
+        if self.max_concurrency == 1:
+            # Nothing else is running, so the next batch can use the indices this one left free
+            next_index = batch.start_index + len(batch_files)
+            self.next_index = next_index
+        self.all_files.extend(batch_files)
+        if batch_files:
+            self.journal.record_batch(batch.start_index, batch.size, batch_files, next_index)
+            self.failed_streak = 0
+            self._resume_at = 0.0
+        else:
+            self._batch_failed(batch)
+
+        print(f"Batch {batch.number} complete: {len(batch_files)} sets generated")
+        print(f"Total progress: {self.generated}/{self.total_sets}")
+
+    def _batch_failed(self, batch: ScheduledBatch):
+        """Back off after a batch that saved nothing, or stop once too many failed in a row"""
+        self.failed_streak += 1
+        if self.max_concurrency > 1:
+            self.free_blocks.append((batch.start_index, batch.size))
+        if self.max_failed_batches and self.failed_streak >= self.max_failed_batches:
+            if not self.stopped:
+                print(f"❌ {self.failed_streak} batches in a row saved no conversation sets, stopping generation")
+            self.stopped = True
+            return
+        delay = min(self.max_backoff, self.failure_backoff * 2 ** (self.failed_streak - 1))
+        self._resume_at = time.monotonic() + delay
+        print(f"⚠️  Batch {batch.number} saved no conversation sets, waiting {delay:.0f}s before the next batch")
+
+
+class BatchCalls:
+    """
+    The calls of one batch: a request for every set, then requests for
+    only the sets that are still missing
+    """
+
+    def __init__(self, batch_size: int, start_index: int, max_retries: int):
+        """
+        Args:
+            batch_size: Sets the batch should save
+            start_index: First output index of the batch's block
+            max_retries: Calls allowed after the first one for sets that are still missing
+        """
+        self.batch_size = batch_size
+        self.start_index = start_index
+        self.max_retries = max_retries
+        self.saved_files: List[str] = []
+        self.calls = 0
+        self.stopped = False
+
+    def next_call(self) -> Optional[Tuple[int, int, bool]]:
+        """
+        The next call of the batch, or None if the batch is done
+
+        Returns:
+            Sets to request, their first index and whether the call is a shortfall retry
+        """
+        missing = self.batch_size - len(self.saved_files)
+        if missing <= 0 or self.stopped or self.calls > self.max_retries:
+            return None
+        if self.calls:
+            print(f"Got {len(self.saved_files)}/{self.batch_size} sets, requesting the missing {missing}...")
+        return missing, self.start_index + len(self.saved_files), self.calls > 0
+
+    def record(self, call_files: List[str], parsed: int):
+        """
+        Record a call's saved files and the number of sets it returned
+
+        Sets the call returned but were rejected are requested again; a call
+        that returned no sets at all ends the batch.
+        """
+        self.calls += 1
+        self.saved_files.extend(call_files)
+        if not parsed:
+            self.stopped = True
@@ -9,15 +9,43 @@ import os
 import yaml
 import json
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 import time
+import asyncio
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-from llm_providers import get_provider
-from prompts import get_conversation_generator_prompt
+from llm_providers import get_provider, GenerationResult, BATCH_IN_PROGRESS, BATCH_FAILED
+from rate_limiter import get_rate_limiter
+from retry_policy import RetryPolicy, ProviderError, FatalError
+from run_journal import RunJournal
+from run_report import RunReport
+from batch_controller import AdaptiveBatchController
+from batch_scheduler import BatchScheduler, BatchCalls
+from prompts import get_conversation_generator_prompt, get_conversation_user_prompt
+from conversation_schema import CONVERSATION_SETS_SCHEMA, SchemaValidationError, parse_structured_output
+from conversation_parser import (
+    ConversationSetRecord, ConversationSetStreamParser, parse_conversation_sets, render_markdown
+)
+from file_writer import BackgroundFileWriter, atomic_write
+from dataset_store import DatasetStore, DATASET_FOLDER, record_from_dict, record_to_dict, set_id_for_index
+from dedup_index import DedupIndex, DEDUP_INDEX_FILENAME
+from diversity_scheduler import DiversityScheduler
+from validation import SetValidator
 from google_sheets_exporter import GoogleSheetsExporter
+from exporters import get_exporters
+from sheets_sync import SheetsSyncState, SYNC_STATE_FILENAME
+from sheets_export_pipeline import SheetsExportPipeline
+
+
+RUN_JOURNAL_FILENAME = "run_journal.jsonl"
+RUN_REPORT_FILENAME = "run_report.json"
+
+FILENAME_UNSAFE_PATTERN = re.compile(r'[^\w\s-]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SAVED_SET_PATTERN = re.compile(r'conversation_set_(\d+)(?:_|\.md$)')
 
 
 class ConversationGenerator:
@@ -28,9 +56,28 @@ class ConversationGenerator:
         self.config_path = config_path  # Store config path for dynamic prompt generation
         self.config = self._load_config(config_path)
         self._load_environment()
+        # With structured output the provider returns JSON matching CONVERSATION_SETS_SCHEMA
+        self.structured_output = self.config['generation'].get('output_format', 'text') == 'json'
         self.provider = self._initialize_provider()
         self.output_folder = Path(self.config['generation']['output_folder'])
         self._ensure_output_folder()
+        self.store = DatasetStore(
+            self.output_folder / DATASET_FOLDER,
+            shard_size=self.config['generation'].get('shard_size', 1000)
+        )
+        writer_config = self.config['generation'].get('file_writer') or {}
+        self.fsync_policy = writer_config.get('fsync', 'batch')
+        self.writer = BackgroundFileWriter(self.fsync_policy) if writer_config.get('background', True) else None
+        self.report = RunReport(self.config['llm']['model'], self.config.get('pricing'))
+        self.batch_controller = AdaptiveBatchController.from_config(self.config)
+        self.sheets_pipeline = None
+        dedup_config = self.config['generation'].get('dedup') or {}
+        self.dedup = DedupIndex(
+            self.output_folder / DEDUP_INDEX_FILENAME,
+            threshold=dedup_config.get('threshold', 0.8)
+        ) if dedup_config.get('enabled', False) else None
+        self.diversity = DiversityScheduler.from_config(self.config)
+        self.validator = SetValidator.from_config(self.config)
     
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file"""
@@ -64,12 +111,21 @@ class ConversationGenerator:
     
     def _initialize_provider(self):
         """Initialize the LLM provider"""
+        self.rate_limiter = get_rate_limiter(
+            self.config,
+            self.config['llm']['provider'],
+            self.config['llm']['model']
+        )
         return get_provider(
             provider_name=self.config['llm']['provider'],
             api_key=self.api_key,
             model=self.config['llm']['model'],
             temperature=self.config['llm']['temperature'],
-            max_tokens=self.config['llm']['max_tokens']
+            max_tokens=self.config['llm']['max_tokens'],
+            rate_limiter=self.rate_limiter,
+            retry_policy=RetryPolicy.from_config(self.config['llm'].get('retry')),
+            base_url=self.config['llm'].get('base_url'),
+            response_schema=CONVERSATION_SETS_SCHEMA if self.structured_output else None
         )
     
     def _ensure_output_folder(self):
@@ -77,32 +133,45 @@ class ConversationGenerator:
         self.output_folder.mkdir(exist_ok=True)
         print(f"Output folder: {self.output_folder.absolute()}")
     
-    def _parse_conversation_sets(self, generated_text: str) -> List[str]:
+    def _parse_conversation_sets(self, generated_text: str) -> List[ConversationSetRecord]:
         """Parse individual conversation sets from generated text"""
-        # Split by "Conversation Set" pattern
-        pattern = r'Conversation Set \d+:'
-        parts = re.split(pattern, generated_text)
-        
-        # Remove empty first part and reconstruct conversation sets
-        conversation_sets = []
-        matches = re.findall(pattern, generated_text)
-        
-        for i, match in enumerate(matches):
-            if i + 1 < len(parts):
-                conversation_set = match + parts[i + 1]
-                conversation_sets.append(conversation_set.strip())
-        
-        return conversation_sets
-    
-    def _save_conversation_set(self, conversation_set: str, index: int):
-        """Save a single conversation set to a markdown file with unique identifier"""
-        # Extract title from conversation set for filename
-        title_match = re.search(r'Conversation Set \d+:\s*(.+?)(?:\n|$)', conversation_set)
-        if title_match:
-            title = title_match.group(1).strip()
-            # Clean title for filename
-            clean_title = re.sub(r'[^\w\s-]', '', title)
-            clean_title = re.sub(r'\s+', '_', clean_title)
+        if not self.structured_output:
+            return parse_conversation_sets(generated_text)
+        try:
+            return parse_structured_output(generated_text)
+        except SchemaValidationError as e:
+            print(f"⚠️  Discarding structured output that does not match the schema: {e}")
+            return []
+    
+    def _save_conversation_set(self, record: ConversationSetRecord, index: int) -> str:
+        """
+        Save a single conversation set to the dataset store and, unless
+        generation.write_markdown is off, to a markdown file with unique identifier
+        
+        Returns:
+            The markdown file path, or the set's store location if no markdown is written
+        """
+        metadata = {
+            "generated_on": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "provider": self.config['llm']['provider'],
+            "model": self.config['llm']['model'],
+            "temperature": str(self.config['llm']['temperature'])
+        }
+        data = record_to_dict(record, index, metadata)
+        entry = self.store.append(data)
+        if self.diversity is not None:
+            self.diversity.observe(record)
+        if self.sheets_pipeline:
+            self.sheets_pipeline.submit(data, self.store.location(entry['id']))
+        
+        if not self.config['generation'].get('write_markdown', True):
+            print(f"Saved: {entry['id']} ({entry['shard']})")
+            return self.store.location(entry['id'])
+        
+        # Clean title for filename
+        clean_title = FILENAME_UNSAFE_PATTERN.sub('', record.title)
+        clean_title = WHITESPACE_PATTERN.sub('_', clean_title.strip())
+        if clean_title:
             filename = f"conversation_set_{index:03d}_{clean_title[:50]}.md"
         else:
             filename = f"conversation_set_{index:03d}.md"
@@ -110,107 +179,459 @@ class ConversationGenerator:
         filepath = self.output_folder / filename
         
         # Format conversation set as proper markdown
-        formatted_content = self._format_as_markdown(conversation_set, index)
+        formatted_content = self._format_as_markdown(record, index, metadata)
         
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(formatted_content)
+        # Written atomically (temp file + rename), so a crash never leaves a truncated file
+        if self.writer:
+            self.writer.write(filepath, formatted_content)
+        else:
+            atomic_write(filepath, formatted_content, self.fsync_policy)
         
         print(f"Saved: {filename}")
-        return filepath
+        return str(filepath)
     
-    def _format_as_markdown(self, conversation_set: str, index: int) -> str:
+    def _format_as_markdown(self, record: ConversationSetRecord, index: int, metadata: Dict[str, str]) -> str:
         """Format conversation set as proper markdown with metadata"""
-        # Extract the title
-        title_match = re.search(r'Conversation Set \d+:\s*(.+?)(?:\n|$)', conversation_set)
-        title = title_match.group(1).strip() if title_match else f"Conversation Set {index}"
-        
-        # Generate metadata header
-        metadata = f"""# Conversation Set {index:03d}: {title}
-
-**Generated on:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  
-**Provider:** {self.config['llm']['provider']}  
-**Model:** {self.config['llm']['model']}  
-**Temperature:** {self.config['llm']['temperature']}  
-
----
-
-"""
+        return render_markdown(record, index, metadata)
+    
+    def _find_saved_sets(self, index: int) -> List[str]:
+        """Where the set at an output index was saved, if it was"""
+        if self.config['generation'].get('write_markdown', True):
+            # "_*" keeps index 100 from matching conversation_set_1000_*.md
+            paths = list(self.output_folder.glob(f"conversation_set_{index:03d}_*.md"))
+            paths.extend(path for path in [self.output_folder / f"conversation_set_{index:03d}.md"] if path.exists())
+            return sorted(str(path) for path in paths)
+        location = self.store.location(set_id_for_index(index))
+        return [location] if location else []
+    
+    def _next_unused_index(self) -> int:
+        """First output index after every set already in the output folder"""
+        indices = [entry["index"] for entry in self.store.entries.values()]
+        for path in self.output_folder.glob("conversation_set_*.md"):
+            match = SAVED_SET_PATTERN.match(path.name)
+            if match:
+                indices.append(int(match.group(1)))
+        return max(indices, default=0) + 1
+    
+    def _save_batch(self, result: GenerationResult, batch_size: int, start_index: int,
+                    retry: bool = False) -> Tuple[List[str], int]:
+        """
+        Parse a batch completion and save its conversation sets
         
-        # Clean up and format the main content
-        content = conversation_set.strip()
+        Returns:
+            The saved files and the number of complete sets parsed, including rejected ones
         
-        # Replace section headers with proper markdown formatting
-        content = re.sub(r'^User Motive:', '**User Motive:**', content, flags=re.MULTILINE)
-        content = re.sub(r'^Domains & Subdomains:', '**Domains & Subdomains:**', content, flags=re.MULTILINE)
-        content = re.sub(r'^Trajectory:', '**Trajectory:**', content, flags=re.MULTILINE)
+        retry marks shortfall calls, which must not size later batches.
+        """
+        # Parse individual conversation sets
+        conversation_sets = self._parse_conversation_sets(result.text)
+        if result.truncated and conversation_sets:
+            # The last set was cut off at max_tokens
+            conversation_sets.pop()
+        self._observe_batch(batch_size, len(conversation_sets), result, retry)
         
-        # Format tool lists
-        content = re.sub(r'^Tools:', '**Tools:**', content, flags=re.MULTILINE)
+        # Save each conversation set, but only as many as were requested: the
+        # index block [start_index, start_index + batch_size) belongs to this
+        # batch, so writing past it would collide with a concurrent batch.
+        # Extra sets take the place of rejected ones, and the shortfall retries
+        # request only as many sets as were rejected.
+        saved_files = []
+        for conversation_set in conversation_sets:
+            if len(saved_files) >= batch_size:
+                break
+            if not self._is_rejected(conversation_set, start_index + len(saved_files)):
+                saved_files.append(self._save_conversation_set(conversation_set, start_index + len(saved_files)))
         
-        return metadata + content
+        return saved_files, len(conversation_sets)
+    
+    def _user_prompt(self, num_sets: int, start_index: int) -> str:
+        """User prompt for a batch, steered towards under-used combinations if generation.diversity is on"""
+        guidance = self.diversity.suggest(num_sets, start_index) if self.diversity is not None else ""
+        return get_conversation_user_prompt(num_sets, start_index, guidance)
+    
+    def _is_rejected(self, record: ConversationSetRecord, index: int) -> bool:
+        """Check a set against the validation rules and the dedup index before it is saved at index"""
+        if self.validator is not None:
+            violations = self.validator.validate(record)
+            if violations:
+                print(f"🚫 Rejecting invalid set ({'; '.join(text for _, text in violations)}): {record.title}")
+                self.report.record_invalid([rule for rule, _ in violations])
+                return True
+        return self._is_duplicate(record, index)
+    
+    def _is_duplicate(self, record: ConversationSetRecord, index: int) -> bool:
+        """Check a set against the dedup index, adding it under index if it is new"""
+        if self.dedup is None:
+            return False
+        match = self.dedup.check_and_add(set_id_for_index(index), record)
+        if match:
+            set_id, score = match
+            print(f"♻️  Skipping near-duplicate of set {set_id} ({score:.0%} similar): {record.title}")
+            self.report.record_duplicate()
+            return True
+        return False
+    
+    def _observe_batch(self, requested: int, parsed: int, result: GenerationResult, retry: bool = False):
+        """Let the adaptive batch controller size the next calls from this one"""
+        if self.batch_controller:
+            self.batch_controller.observe(requested, parsed, result, retry)
+            self.provider.max_tokens = self.batch_controller.max_tokens
+    
+    def _next_batch_size(self, batch_size: int) -> int:
+        """Sets to request in the next call: the adaptive size if enabled, else the configured one"""
+        if self.batch_controller:
+            return self.batch_controller.batch_size
+        return batch_size
     
     def generate_batch(self, batch_size: int, start_index: int = 1) -> List[str]:
-        """Generate a batch of conversation sets"""
+        """
+        Generate a batch of conversation sets
+        
+        If a call returns fewer sets than requested, only the missing ones are
+        requested again (up to generation.max_shortfall_retries times).
+        """
         # Generate dynamic system prompt based on current config
         system_prompt = get_conversation_generator_prompt(self.config_path)
         
         print(f"Generating batch of {batch_size} conversation sets...")
         print(f"Provider: {self.config['llm']['provider']} ({self.config['llm']['model']})")
         
+        calls = self._batch_calls(batch_size, start_index)
+        call = calls.next_call()
+        while call:
+            calls.record(*self._generate_call(system_prompt, *call))
+            call = calls.next_call()
+        return calls.saved_files
+    
+    def _batch_calls(self, batch_size: int, start_index: int) -> BatchCalls:
+        return BatchCalls(batch_size, start_index, self.config['generation'].get('max_shortfall_retries', 1))
+    
+    def _generate_call(self, system_prompt: str, num_sets: int, start_index: int,
+                       retry: bool = False) -> Tuple[List[str], int]:
+        """
+        Make one API call for num_sets sets and save them from start_index on
+        (retry = a shortfall call for the sets an earlier call did not return)
+        
+        Returns:
+            The saved files and the number of complete sets the call returned
+        """
         try:
-            generated_text = self.provider.generate(
+            # Structured output is only usable once the whole JSON document has arrived
+            if self.config['llm'].get('stream', False) and not self.structured_output:
+                return self._stream_batch(system_prompt, num_sets, start_index, retry)
+            
+            result = self.provider.generate(
                 system_prompt=system_prompt,
-                user_prompt=""  # No separate user prompt needed
+                user_prompt=self._user_prompt(num_sets, start_index)
             )
-            
-            # Parse individual conversation sets
-            conversation_sets = self._parse_conversation_sets(generated_text)
-            
-            # Save each conversation set
-            saved_files = []
-            for i, conversation_set in enumerate(conversation_sets):
-                if conversation_set.strip():  # Only save non-empty sets
-                    filepath = self._save_conversation_set(conversation_set, start_index + i)
-                    saved_files.append(str(filepath))
-            
-            return saved_files
-            
+            return self._save_call(result, num_sets, start_index, retry)
         except Exception as e:
-            print(f"Error generating batch: {e}")
-            return []
+            return self._call_failed(e)
+    
+    def _save_call(self, result: GenerationResult, num_sets: int, start_index: int,
+                   retry: bool = False) -> Tuple[List[str], int]:
+        """Save the sets of a finished call and record it in the run report"""
+        saved_files, parsed = self._save_batch(result, num_sets, start_index, retry)
+        self.report.record_batch(start_index, num_sets, len(saved_files), result)
+        return saved_files, parsed
+    
+    def _call_failed(self, error: Exception) -> Tuple[List[str], int]:
+        """Record a failed call; fatal provider errors stop generation, anything else ends the call empty"""
+        self.report.record_failure()
+        if isinstance(error, FatalError):
+            # Retrying or looping again cannot fix this (bad key, bad request...)
+            print(f"❌ Fatal provider error, stopping generation: {error}")
+            raise error
+        if isinstance(error, ProviderError):
+            print(f"Error generating batch after retries: {error}")
+        else:
+            print(f"Error generating batch: {error}")
+        return [], 0
+    
+    def _stream_batch(self, system_prompt: str, batch_size: int, start_index: int,
+                      retry: bool = False) -> Tuple[List[str], int]:
+        """
+        Stream a batch completion, saving each conversation set as soon as it is complete
+        
+        If the stream breaks off, the sets that were already finished are kept
+        and only the incomplete one is lost.
+        """
+        parser = ConversationSetStreamParser()
+        saved_files = []
+        parsed = []
+        
+        def save(conversation_sets: List[ConversationSetRecord]):
+            for conversation_set in conversation_sets:
+                parsed.append(conversation_set)
+                if len(saved_files) < batch_size and not self._is_rejected(
+                        conversation_set, start_index + len(saved_files)):
+                    saved_files.append(self._save_conversation_set(conversation_set, start_index + len(saved_files)))
+        
+        try:
+            result = self.provider.generate_stream(
+                system_prompt=system_prompt,
+                user_prompt=self._user_prompt(batch_size, start_index),
+                on_text=lambda chunk: save(parser.feed(chunk))
+            )
+        except ProviderError as e:
+            if isinstance(e, FatalError) or not saved_files:
+                raise
+            print(f"Stream interrupted after {len(saved_files)} complete sets, keeping them: {e}")
+            # The provider reports usage only for completed streams
+            self.report.record_batch(start_index, batch_size, len(saved_files))
+            return saved_files, len(parsed)
+        
+        final_sets = parser.close()
+        if not result.truncated:
+            # Otherwise the last set was cut off at max_tokens
+            save(final_sets)
+        self._observe_batch(batch_size, len(parsed), result, retry)
+        self.report.record_batch(start_index, batch_size, len(saved_files), result)
+        return saved_files, len(parsed)
+    
+    async def agenerate_batch(self, batch_size: int, start_index: int = 1) -> List[str]:
+        """Generate a batch of conversation sets using the provider's async client"""
+        system_prompt = get_conversation_generator_prompt(self.config_path)
+        
+        print(f"Generating batch of {batch_size} conversation sets...")
+        
+        calls = self._batch_calls(batch_size, start_index)
+        call = calls.next_call()
+        while call:
+            calls.record(*await self._agenerate_call(system_prompt, *call))
+            call = calls.next_call()
+        return calls.saved_files
+    
+    async def _agenerate_call(self, system_prompt: str, num_sets: int, start_index: int,
+                              retry: bool = False) -> Tuple[List[str], int]:
+        """Async counterpart of _generate_call"""
+        try:
+            result = await self.provider.agenerate(
+                system_prompt=system_prompt,
+                user_prompt=self._user_prompt(num_sets, start_index)
+            )
+            return self._save_call(result, num_sets, start_index, retry)
+        except Exception as e:
+            return self._call_failed(e)
     
     def generate_all(self) -> Dict[str, Any]:
         """Generate all requested conversation sets"""
+        if self.config['generation'].get('batch_api', {}).get('enabled', False):
+            return self.generate_bulk()
+        if self.config['generation'].get('concurrency_backend', 'threads') == 'async':
+            return asyncio.run(self.agenerate_all())
+        
+        total_sets = self.config['generation']['num_conversation_sets']
+        batch_size = self.config['generation']['batch_size']
+        max_concurrency = max(1, int(self.config['generation'].get('max_concurrency', 1)))
+        
+        self._print_run_header(total_sets, batch_size, max_concurrency)
+        schedule = self._schedule(total_sets, batch_size, max_concurrency)
+        
+        try:
+            if max_concurrency > 1:
+                self._generate_concurrent(schedule)
+            else:
+                self._generate_sequential(schedule)
+        finally:
+            # Also after a fatal error, so queued rows, the report and the summary are not lost
+            summary = self._finish_run(total_sets, sorted(schedule.all_files))
+        return summary
+    
+    async def agenerate_all(self) -> Dict[str, Any]:
+        """
+        Generate all requested conversation sets on a single event loop
+        
+        Up to generation.max_concurrency requests are kept in flight without
+        dedicating an OS thread to each one.
+        """
         total_sets = self.config['generation']['num_conversation_sets']
         batch_size = self.config['generation']['batch_size']
+        max_concurrency = max(1, int(self.config['generation'].get('max_concurrency', 1)))
         
+        self._print_run_header(total_sets, batch_size, max_concurrency)
+        schedule = self._schedule(total_sets, batch_size, max_concurrency)
+        
+        try:
+            await self._agenerate_concurrent(schedule)
+        finally:
+            summary = self._finish_run(total_sets, sorted(schedule.all_files))
+        return summary
+    
+    def generate_bulk(self) -> Dict[str, Any]:
+        """
+        Generate all requested conversation sets through the provider's Batch API
+        
+        Every missing batch is submitted as one request of a single batch job,
+        which is polled until it finishes. The results are then parsed and saved
+        exactly like interactive batches. Jobs may take up to 24 hours but cost
+        less and are not bound by the interactive rate limits.
+        """
+        if not self.provider.supports_batch_api:
+            raise ValueError(f"Provider '{self.config['llm']['provider']}' does not support the Batch API")
+        
+        total_sets = self.config['generation']['num_conversation_sets']
+        batch_size = self.config['generation']['batch_size']
+        poll_interval = self.config['generation'].get('batch_api', {}).get('poll_interval', 30)
+        
+        self._print_run_header(total_sets, batch_size, 1)
+        completed_files, next_index = self._start_run(total_sets)
+        self.report.cost_multiplier = self.config['generation'].get('batch_api', {}).get('cost_multiplier', 0.5)
+        all_files = list(completed_files)
+        
+        try:
+            # Collect jobs submitted by an interrupted run instead of paying for them again
+            for job in self.journal.pending_batch_jobs():
+                print(f"Collecting batch job {job['batch_id']} from the previous run...")
+                all_files.extend(self._collect_batch_job(job['batch_id'], job['blocks'], poll_interval))
+            next_index = max(next_index, self.journal.next_index())
+            
+            while len(all_files) < total_sets:
+                system_prompt = get_conversation_generator_prompt(self.config_path)
+                
+                requests = {}
+                blocks = {}  # custom ID -> [start index, requested sets]
+                remaining = total_sets - len(all_files)
+                while remaining > 0:
+                    current_batch_size = min(self._next_batch_size(batch_size), remaining)
+                    custom_id = f"sets-{next_index}-{current_batch_size}"
+                    requests[custom_id] = (system_prompt,
+                                           self._user_prompt(current_batch_size, next_index))
+                    blocks[custom_id] = [next_index, current_batch_size]
+                    next_index += current_batch_size
+                    remaining -= current_batch_size
+                
+                batch_id = self.provider.submit_batch(requests)
+                self.journal.record_batch_job(batch_id, blocks)
+                print(f"\nSubmitted batch job {batch_id} with {len(requests)} requests")
+                
+                batch_files = self._collect_batch_job(batch_id, blocks, poll_interval)
+                all_files.extend(batch_files)
+                print(f"Total progress: {len(all_files)}/{total_sets}")
+                
+                if not batch_files:
+                    print("❌ Batch job produced no conversation sets, stopping")
+                    break
+        finally:
+            summary = self._finish_run(total_sets, sorted(all_files))
+        return summary
+    
+    def _collect_batch_job(self, batch_id: str, blocks: Dict[str, List[int]], poll_interval: float) -> List[str]:
+        """Wait for a Batch API job to finish, then save the conversation sets it generated"""
+        status = self.provider.get_batch_status(batch_id)
+        while status == BATCH_IN_PROGRESS:
+            print(f"Batch job {batch_id} in progress, checking again in {poll_interval} seconds...")
+            time.sleep(poll_interval)
+            status = self.provider.get_batch_status(batch_id)
+        
+        if status == BATCH_FAILED:
+            print(f"❌ Batch job {batch_id} failed")
+            self.journal.record_batch_job_done(batch_id)
+            return []
+        
+        results = self.provider.get_batch_results(batch_id)
+        saved_files = []
+        for custom_id, (start_index, requested) in blocks.items():
+            result = results.get(custom_id)
+            if not result or self.journal.is_batch_complete(start_index):
+                continue
+            try:
+                batch_files, _ = self._save_batch(result, requested, start_index)
+            except Exception as e:
+                # One bad result must not lose the others or block collecting the job on resume
+                print(f"Error saving batch job result {custom_id}: {e}")
+                self.report.record_failure()
+                continue
+            self.report.record_batch(start_index, requested, len(batch_files), result)
+            if batch_files:
+                self.journal.record_batch(start_index, requested, batch_files, start_index + requested)
+                saved_files.extend(batch_files)
+        
+        self.journal.record_batch_job_done(batch_id)
+        print(f"Batch job {batch_id} complete: {len(saved_files)} sets generated "
+              f"from {len(results)}/{len(blocks)} successful requests")
+        return saved_files
+    
+    def _print_run_header(self, total_sets: int, batch_size: int, max_concurrency: int):
+        """Print the run settings before generation starts"""
         print(f"Starting generation of {total_sets} conversation sets...")
         print(f"Batch size: {batch_size}")
+        if max_concurrency > 1:
+            print(f"Concurrent batches: {max_concurrency}")
         print("-" * 50)
+    
+    def _start_run(self, total_sets: int) -> Tuple[List[str], int]:
+        """
+        Open the run journal and work out where generation should start
         
-        all_files = []
-        generated_count = 0
-        batch_count = 0
+        With generation.resume enabled, files recorded by an interrupted run
+        count towards the total and new batches continue after the last
+        reserved index instead of overwriting earlier output. A run that
+        finished is not resumed; the next one starts a fresh journal and
+        numbers its sets after those already in the output folder.
         
-        while generated_count < total_sets:
-            batch_count += 1
-            remaining = total_sets - generated_count
-            current_batch_size = min(batch_size, remaining)
-            
-            print(f"\nBatch {batch_count}: Generating {current_batch_size} sets...")
-            
-            batch_files = self.generate_batch(current_batch_size, generated_count + 1)
-            all_files.extend(batch_files)
-            generated_count += len(batch_files)
-            
-            print(f"Batch {batch_count} complete: {len(batch_files)} sets generated")
-            print(f"Total progress: {generated_count}/{total_sets}")
-            
-            # Add delay between batches to respect API limits
-            if generated_count < total_sets:
-                delay = 2  # 2 second delay between batches
-                print(f"Waiting {delay} seconds before next batch...")
-                time.sleep(delay)
+        Returns:
+            Files already generated and the first free output index
+        """
+        self.journal = RunJournal(self.output_folder / RUN_JOURNAL_FILENAME)
+        # Start a fresh report so it only covers this run's calls
+        self.report = RunReport(self.config['llm']['model'], self.config.get('pricing'))
+        
+        resume = self.config['generation'].get('resume', False)
+        if resume and self.journal.is_run_complete():
+            print("Previous run finished, starting a new run")
+            resume = False
+        if not resume:
+            self.journal.reset()
+        
+        self.sheets_pipeline = self._start_sheets_pipeline()
+        self.diversity = DiversityScheduler.from_config(self.config)
+        if not resume:
+            # Number new sets after the earlier runs' output, so no file or
+            # set ID is reused: exported IDs and dedup signatures keep naming
+            # the same sets, and a later resume cannot mistake old files for
+            # this run's orphans
+            return [], self._next_unused_index()
+        
+        # Batches that were still running when the previous run died may
+        # have saved some of their sets; keep those instead of paying again
+        for reservation in self.journal.unfinished_reservations():
+            start_index, requested = reservation['start_index'], reservation['requested']
+            orphans = [
+                location
+                for index in range(start_index, start_index + requested)
+                for location in self._find_saved_sets(index)
+            ]
+            if orphans:
+                self.journal.record_batch(start_index, requested, orphans, start_index + requested)
+        
+        completed_files = self.journal.completed_files()
+        next_index = self.journal.next_index()
+        if self.diversity is not None:
+            # Steer away from what the earlier runs already covered
+            self.diversity.observe_all(record_from_dict(data) for data in self.store.iter_sets())
+        if completed_files:
+            print(f"Resuming run: {len(completed_files)}/{total_sets} sets already generated, "
+                  f"continuing from index {next_index}")
+        return completed_files, next_index
+    
+    def _finish_run(self, total_sets: int, all_files: List[str]) -> Dict[str, Any]:
+        """Print the run summary, export the results and return the summary"""
+        if self.writer:
+            # Every file must be on disk before it is reported or exported
+            self.writer.flush()
+            if self.writer.errors:
+                print(f"❌ {len(self.writer.errors)} files could not be written")
+        if self.sheets_pipeline:
+            self.sheets_pipeline.close()
+            print(f"📊 Streamed {self.sheets_pipeline.exported} sets to Google Sheets during generation "
+                  f"({self.sheets_pipeline.exporter.client.calls} Sheets API calls)")
+            if self.sheets_pipeline.failed:
+                print(f"⚠️  {self.sheets_pipeline.failed} sets could not be streamed and will be sent by the final export")
+            self.sheets_pipeline = None
+        generated_count = len(all_files)
+        if generated_count >= total_sets:
+            self.journal.record_run_complete(generated_count)
         
         # Generate summary for console display only
         summary = {
@@ -221,6 +642,7 @@ class ConversationGenerator:
             "provider": self.config['llm']['provider'],
             "model": self.config['llm']['model'],
             "generation_time": datetime.now().isoformat(),
+            "usage": self.report.totals(),
             "files": all_files
         }
         
@@ -233,46 +655,131 @@ class ConversationGenerator:
         print(f"Temperature: {self.config['llm']['temperature']}")
         print(f"Generation time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
-        # Export to Google Sheets if enabled (conversation sets only)
-        self._export_to_google_sheets()
+        usage = summary['usage']
+        print(f"Tokens: {usage['input_tokens']} input, {usage['output_tokens']} output "
+              f"over {usage['requests']} requests ({usage['truncated_requests']} hit max_tokens)")
+        if usage['input_tokens']:
+            cache_rate = usage['cached_input_tokens'] / usage['input_tokens'] * 100
+            print(f"Prompt cache: {usage['cached_input_tokens']}/{usage['input_tokens']} "
+                  f"input tokens read from cache ({cache_rate:.1f}%)")
+        if usage['duplicate_sets']:
+            print(f"Near-duplicates rejected: {usage['duplicate_sets']}")
+        if usage['invalid_sets']:
+            rules = ', '.join(f"{rule}: {count}" for rule, count in sorted(usage['violations'].items()))
+            print(f"Invalid sets rejected: {usage['invalid_sets']} ({rules})")
+        if usage['cost_usd'] is not None:
+            print(f"Estimated cost: ${usage['cost_usd']:.4f} (${usage['cost_per_set_usd'] or 0:.4f} per set)")
+        
+        report_path = self.output_folder / RUN_REPORT_FILENAME
+        self.report.write(report_path)
+        print(f"Run report: {report_path}")
+        
+        # Run the configured exporters (conversation sets only)
+        self._export_results()
         
         print("=" * 50)
         
         return summary
     
-    def _export_to_google_sheets(self):
-        """Export conversation sets to Google Sheets if enabled"""
+    def _schedule(self, total_sets: int, batch_size: int, max_concurrency: int) -> BatchScheduler:
+        """Start the run and schedule the batches still missing from it"""
+        completed_files, next_index = self._start_run(total_sets)
+        return BatchScheduler(
+            self.journal, total_sets, completed_files, next_index,
+            lambda: self._next_batch_size(batch_size), max_concurrency,
+            max_failed_batches=self.config['generation'].get('max_failed_batches', 5),
+            failure_backoff=self.config['generation'].get('failure_backoff', 5)
+        )
+    
+    def _generate_sequential(self, schedule: BatchScheduler):
+        """Run batches one after another until the requested total is reached"""
+        while not schedule.finished:
+            # Set after an empty batch, whether or not a rate limiter is pacing calls
+            time.sleep(schedule.backoff_remaining())
+            for batch in schedule.reserve([]):
+                schedule.complete(batch, self.generate_batch(batch.size, batch.start_index))
+            
+            # Add delay between batches to respect API limits, unless the
+            # rate limiter is already pacing requests to the configured quota
+            if not schedule.finished and self.rate_limiter is None and not schedule.failed_streak:
+                delay = self.config['generation'].get('batch_delay', 2)
+                if delay:
+                    print(f"Waiting {delay} seconds before next batch...")
+                    time.sleep(delay)
+    
+    def _generate_concurrent(self, schedule: BatchScheduler):
+        """Keep up to schedule.max_concurrency generate_batch calls in flight at once"""
+        in_flight = {}  # future -> batch
+        with ThreadPoolExecutor(max_workers=schedule.max_concurrency) as executor:
+            while not schedule.finished or in_flight:
+                for batch in schedule.reserve(list(in_flight.values())):
+                    in_flight[executor.submit(self.generate_batch, batch.size, batch.start_index)] = batch
+                if not in_flight:
+                    time.sleep(schedule.backoff_remaining())
+                    continue
+                
+                done, _ = wait(in_flight, timeout=schedule.backoff_remaining() or None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    schedule.complete(in_flight.pop(future), future.result())
+    
+    async def _agenerate_concurrent(self, schedule: BatchScheduler):
+        """Async counterpart of _generate_concurrent, using tasks instead of threads"""
+        in_flight = {}  # task -> batch
+        while not schedule.finished or in_flight:
+            for batch in schedule.reserve(list(in_flight.values())):
+                in_flight[asyncio.create_task(self.agenerate_batch(batch.size, batch.start_index))] = batch
+            if not in_flight:
+                await asyncio.sleep(schedule.backoff_remaining())
+                continue
+            
+            done, _ = await asyncio.wait(in_flight, timeout=schedule.backoff_remaining() or None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                schedule.complete(in_flight.pop(task), task.result())
+    
+    def _start_sheets_pipeline(self) -> Optional[SheetsExportPipeline]:
+        """Start exporting saved sets to Google Sheets while generation runs, if enabled"""
         google_sheets_config = self.config.get('google_sheets', {})
-        
-        if not google_sheets_config.get('enabled', False):
-            print("📊 Google Sheets export is disabled")
-            return
-        
-        print("\n🔄 Exporting to Google Sheets...")
+        if not (google_sheets_config.get('enabled', False) and google_sheets_config.get('stream_export', False)):
+            return None
         
         try:
             exporter = GoogleSheetsExporter(
-                credentials_file=google_sheets_config.get('credentials_file', 'credentials.json')
+                credentials_file=google_sheets_config.get('credentials_file', 'credentials.json'),
+                retry_policy=RetryPolicy.from_config(google_sheets_config.get('retry'))
             )
+            spreadsheet_url = google_sheets_config.get('spreadsheet_url') or None
+            worksheet_name = google_sheets_config.get('worksheet_name')
+            sync_state = SheetsSyncState(self.output_folder / SYNC_STATE_FILENAME, spreadsheet_url, worksheet_name)
             
-            spreadsheet_url = google_sheets_config.get('spreadsheet_url', '')
+            if not exporter.open_worksheet(spreadsheet_url, worksheet_name, sync_state,
+                                           google_sheets_config.get('turn_columns', 8)):
+                print("⚠️  Streaming Sheets export unavailable, exporting at the end of the run instead")
+                return None
             
-            # Export conversation sets only
-            success = exporter.export_conversation_sets(
-                conversation_sets_folder=str(self.output_folder),
-                spreadsheet_url=spreadsheet_url if spreadsheet_url else None,
-                worksheet_name=google_sheets_config.get('worksheet_name'),
-                start_row=google_sheets_config.get('start_row', 2)
+            print("📊 Streaming saved sets to Google Sheets during generation")
+            return SheetsExportPipeline(
+                exporter,
+                google_sheets_config.get('start_row', 2),
+                sync_state,
+                chunk_size=google_sheets_config.get('chunk_size', 500),
+                flush_interval=google_sheets_config.get('flush_interval', 30)
             )
-            
-            if success:
-                print("✅ Google Sheets export completed successfully!")
-            else:
-                print("❌ Google Sheets export failed")
-                
         except Exception as e:
-            print(f"❌ Google Sheets export error: {e}")
-            print("💡 You can manually export later using: python google_sheets_exporter.py")
+            print(f"⚠️  Streaming Sheets export unavailable ({e}), exporting at the end of the run instead")
+            return None
+    
+    def _export_results(self):
+        """Export conversation sets with the exporters configured in the export section"""
+        try:
+            exporters = get_exporters(self.config)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        
+        for exporter in exporters:
+            exporter.export(str(self.output_folder))
 
 
 def main():
@@ -0,0 +1,212 @@
+"""
+Single-pass parser for generated conversation sets
+
+Model output and saved markdown files are both tokenized line by line with
+precompiled patterns into ConversationSetRecord objects. Markdown files and
+spreadsheet rows are rendered from those records, so each output is only
+scanned once.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+# "Conversation Set 3: Title", optionally decorated as a markdown header or bold
+SET_HEADER_PATTERN = re.compile(r'^[ \t#*]*Conversation Set\s+(\d+)\s*:', re.MULTILINE)
+
+# One pattern classifies every line; the first group that matches wins
+LINE_PATTERN = re.compile(
+    r'^[ \t#>*]*(?:'
+    r'Conversation Set\s+(?P<number>\d+)\s*:\**\s*(?P<title>.*?)'
+    r'|(?P<label>User Motive|Domains & Subdomains|Trajectory|Tools(?: used)?)\s*(?::\**|\**:|\**\s*$)\s*(?P<rest>.*?)'
+    r'|(?P<turn>\d+)\.(?:\s+(?P<turn_text>.*?))?'
+    r'|\*\*(?P<key>[^*:]+):\*\*\s*(?P<value>.*?)'
+    r'|(?P<rule>-{3,})'
+    r')[ \t*]*$'
+)
+
+# Markdown labels of the metadata saved with every set
+METADATA_LABELS = {
+    'generated_on': 'Generated on',
+    'provider': 'Provider',
+    'model': 'Model',
+    'temperature': 'Temperature',
+}
+
+METADATA_KEYS = {label: key for key, label in METADATA_LABELS.items()}
+
+SECTIONS = {
+    'User Motive': 'motive',
+    'Domains & Subdomains': 'domains',
+    'Trajectory': 'trajectory',
+}
+
+
+@dataclass
+class Turn:
+    """One user turn of a conversation set and the tools it needs"""
+
+    text: str = ""
+    tools: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ConversationSetRecord:
+    """Structured form of one conversation set"""
+
+    number: int
+    title: str = ""
+    motive: str = ""
+    domains: List[str] = field(default_factory=list)
+    turns: List[Turn] = field(default_factory=list)
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+
+class _RecordBuilder:
+    """Accumulates the lines of one conversation set into a record"""
+
+    def __init__(self, number: int, title: str):
+        self.record = ConversationSetRecord(number=number, title=title)
+        self.section: Optional[str] = None
+        self.motive_lines: List[str] = []
+        self.turn_lines: List[str] = []
+
+    def start_section(self, section: str):
+        self.close_turn()
+        self.section = section
+
+    def add_text(self, text: str):
+        if not text:
+            return
+        if self.section == 'motive':
+            self.motive_lines.append(text)
+        elif self.section == 'domains':
+            self.record.domains.append(text.lstrip('-• ').strip())
+        elif self.section == 'trajectory':
+            self.turn_lines.append(text)
+
+    def add_tools(self, tools: str):
+        self.record.turns.append(Turn(
+            text='\n'.join(self.turn_lines),
+            tools=[tool.strip() for tool in tools.split(',') if tool.strip()]
+        ))
+        self.turn_lines = []
+        self.section = 'trajectory'
+
+    def close_turn(self):
+        """Keep turn text that was not followed by a Tools line"""
+        if self.turn_lines:
+            self.record.turns.append(Turn(text='\n'.join(self.turn_lines)))
+            self.turn_lines = []
+
+    def build(self) -> ConversationSetRecord:
+        self.close_turn()
+        self.record.motive = ' '.join(self.motive_lines)
+        return self.record
+
+
+def parse_conversation_sets(text: str) -> List[ConversationSetRecord]:
+    """
+    Parse every conversation set in a model completion or markdown file
+
+    Accepts the plain "Label:" format the prompt asks for as well as
+    markdown variants ("**User Motive:**", "## Trajectory", "### 1.",
+    "> turn text"). Text before the first set header is ignored.
+    """
+    records = []
+    builder: Optional[_RecordBuilder] = None
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        match = LINE_PATTERN.match(stripped)
+
+        if match and match.group('number'):
+            if builder:
+                records.append(builder.build())
+            builder = _RecordBuilder(int(match.group('number')), match.group('title').strip())
+            continue
+        if builder is None:
+            continue
+
+        if match is None:
+            builder.add_text(stripped.lstrip('> ').strip())
+        elif match.group('label'):
+            label = match.group('label')
+            if label.startswith('Tools'):
+                builder.add_tools(match.group('rest'))
+            else:
+                builder.start_section(SECTIONS[label])
+                builder.add_text(match.group('rest'))
+        elif match.group('turn'):
+            if builder.section == 'trajectory':
+                # "### 1." on its own line or "1. text" with the turn on the same line
+                builder.close_turn()
+                builder.add_text(match.group('turn_text') or '')
+            else:
+                builder.add_text(stripped.lstrip('> ').strip())
+        elif match.group('key'):
+            label = match.group('key').strip()
+            key = METADATA_KEYS.get(label, label)
+            builder.record.metadata[key] = match.group('value').strip()
+        # Horizontal rules carry no content
+
+    if builder:
+        records.append(builder.build())
+    return records
+
+
+def render_markdown(record: ConversationSetRecord, index: int, metadata: Dict[str, str]) -> str:
+    """
+    Render a record as a markdown file
+
+    Args:
+        record: The conversation set
+        index: Output index used in the heading
+        metadata: Values written as bold lines under the heading, keyed like METADATA_LABELS
+    """
+    lines = [f"# Conversation Set {index:03d}: {record.title or f'Conversation Set {index}'}", ""]
+    lines.extend(f"**{METADATA_LABELS.get(key, key)}:** {value}  " for key, value in metadata.items())
+    lines.extend(["", "---", "", "**User Motive:**  ", record.motive, "", "---", "", "## Domains & Subdomains", ""])
+    lines.extend(f"- {domain}" for domain in record.domains)
+    lines.extend(["", "---", "", "## Trajectory"])
+    for number, turn in enumerate(record.turns, 1):
+        lines.extend(["", f"### {number}.", ""])
+        lines.extend(f"> {line}" for line in turn.text.splitlines())
+        if turn.tools:
+            lines.extend(["", f"**Tools:** {', '.join(turn.tools)}"])
+        lines.extend(["", "---"])
+    return '\n'.join(lines) + '\n'
+
+
+class ConversationSetStreamParser:
+    """Split streamed model output into conversation sets as soon as each one is complete"""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> List[ConversationSetRecord]:
+        """
+        Add a chunk of streamed text
+
+        Returns:
+            Conversation sets completed by this chunk, i.e. every set whose
+            following "Conversation Set N:" header has now arrived
+        """
+        self.buffer += chunk
+        headers = list(SET_HEADER_PATTERN.finditer(self.buffer))
+        if len(headers) < 2:
+            return []
+
+        completed = parse_conversation_sets(self.buffer[headers[0].start():headers[-1].start()])
+        # Keep only the set that is still being streamed
+        self.buffer = self.buffer[headers[-1].start():]
+        return completed
+
+    def close(self) -> List[ConversationSetRecord]:
+        """Return the final conversation set once the stream has ended"""
+        records = parse_conversation_sets(self.buffer)
+        self.buffer = ""
+        return records
@@ -0,0 +1,123 @@
+"""
+JSON schema and validator for structured conversation set output
+"""
+
+import json
+from typing import Any, Dict, List
+
+from conversation_parser import ConversationSetRecord, Turn
+
+
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+# Every property is required and no others are allowed, as OpenAI's strict
+# structured outputs demand
+CONVERSATION_SETS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "conversation_sets": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": _STRING,
+                    "user_motive": _STRING,
+                    "domains": _STRING_LIST,
+                    "turns": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "text": _STRING,
+                                "tools": _STRING_LIST
+                            },
+                            "required": ["text", "tools"],
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["title", "user_motive", "domains", "turns"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["conversation_sets"],
+    "additionalProperties": False
+}
+
+
+class SchemaValidationError(ValueError):
+    """Structured output that does not match CONVERSATION_SETS_SCHEMA"""
+
+
+def _string(value: Any, path: str) -> str:
+    if not isinstance(value, str):
+        raise SchemaValidationError(f"{path} must be a string")
+    return value
+
+
+def _string_list(value: Any, path: str) -> List[str]:
+    if not isinstance(value, list):
+        raise SchemaValidationError(f"{path} must be an array")
+    for i, item in enumerate(value):
+        _string(item, f"{path}[{i}]")
+    return value
+
+
+def _object(value: Any, path: str, keys: tuple) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise SchemaValidationError(f"{path} must be an object")
+    missing = [key for key in keys if key not in value]
+    if missing:
+        raise SchemaValidationError(f"{path} is missing {', '.join(missing)}")
+    return value
+
+
+def validate_conversation_sets(data: Any) -> List[ConversationSetRecord]:
+    """
+    Check decoded structured output against the schema and convert it to records
+
+    This is a hand-written check of exactly the schema above, which is much
+    faster than a generic JSON Schema validator. Unknown extra keys are ignored.
+
+    Raises:
+        SchemaValidationError: Naming the first field that does not match
+    """
+    sets = _object(data, "$", ("conversation_sets",))["conversation_sets"]
+    if not isinstance(sets, list):
+        raise SchemaValidationError("$.conversation_sets must be an array")
+
+    records = []
+    for i, item in enumerate(sets):
+        path = f"$.conversation_sets[{i}]"
+        _object(item, path, ("title", "user_motive", "domains", "turns"))
+        if not isinstance(item["turns"], list):
+            raise SchemaValidationError(f"{path}.turns must be an array")
+
+        turns = []
+        for j, turn in enumerate(item["turns"]):
+            turn_path = f"{path}.turns[{j}]"
+            _object(turn, turn_path, ("text", "tools"))
+            turns.append(Turn(
+                text=_string(turn["text"], f"{turn_path}.text").strip(),
+                tools=[tool.strip() for tool in _string_list(turn["tools"], f"{turn_path}.tools")]
+            ))
+
+        records.append(ConversationSetRecord(
+            number=i + 1,
+            title=_string(item["title"], f"{path}.title").strip(),
+            motive=_string(item["user_motive"], f"{path}.user_motive").strip(),
+            domains=[domain.strip() for domain in _string_list(item["domains"], f"{path}.domains")],
+            turns=turns
+        ))
+    return records
+
+
+def parse_structured_output(text: str) -> List[ConversationSetRecord]:
+    """Decode and validate a structured output completion"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise SchemaValidationError(f"output is not valid JSON: {e}") from e
+    return validate_conversation_sets(data)
@@ -0,0 +1,182 @@
+"""
+Append-only, sharded JSONL store for generated conversation sets
+
+Every saved set is appended as one JSON line to the current shard, and an
+index line records where it went (shard, byte offset, length). Readers look
+sets up by ID or stream the whole dataset from the shards instead of opening
+one markdown file per set.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+from conversation_parser import ConversationSetRecord, Turn, render_markdown
+
+
+DATASET_FOLDER = "dataset"
+INDEX_FILENAME = "index.jsonl"
+
+
+def set_id_for_index(index: int) -> str:
+    """ID of the conversation set saved at an output index"""
+    return f"{index:03d}"
+
+
+def record_to_dict(record: ConversationSetRecord, index: int, metadata: Dict[str, str]) -> Dict[str, Any]:
+    """Serialize a record as a dataset line"""
+    return {
+        "id": set_id_for_index(index),
+        "index": index,
+        "title": record.title,
+        "user_motive": record.motive,
+        "domains": record.domains,
+        "turns": [{"text": turn.text, "tools": turn.tools} for turn in record.turns],
+        "metadata": metadata
+    }
+
+
+def record_from_dict(data: Dict[str, Any]) -> ConversationSetRecord:
+    """Rebuild a record from a dataset line"""
+    return ConversationSetRecord(
+        number=data["index"],
+        title=data["title"],
+        motive=data["user_motive"],
+        domains=data["domains"],
+        turns=[Turn(text=turn["text"], tools=turn["tools"]) for turn in data["turns"]],
+        metadata=data.get("metadata", {})
+    )
+
+
+class DatasetStore:
+    """Sharded JSONL dataset with an ID -> (shard, offset, length) index"""
+
+    def __init__(self, folder: Path, shard_size: int = 1000):
+        """
+        Open the store, creating it if needed
+
+        Args:
+            folder: Folder holding the shards and the index
+            shard_size: Number of sets written to a shard before starting the next one
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.folder / INDEX_FILENAME
+        self.shard_size = max(1, shard_size)
+        self.entries: Dict[str, Dict[str, Any]] = {}  # Latest index entry per set ID
+        self.shard = 0
+        self.shard_count = 0  # Sets written to the current shard
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @classmethod
+    def exists(cls, folder: Path) -> bool:
+        """Whether a store has been written to folder"""
+        return (Path(folder) / INDEX_FILENAME).exists()
+
+    def _load_index(self):
+        """Load the index, ignoring a line left half-written by a crash"""
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.entries[entry["id"]] = entry
+                shard = entry["shard_number"]
+                if shard > self.shard:
+                    self.shard, self.shard_count = shard, 0
+                if shard == self.shard:
+                    self.shard_count += 1
+
+    def _shard_path(self, shard: int) -> Path:
+        return self.folder / f"shard-{shard:05d}.jsonl"
+
+    def append(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Append a set to the current shard and index it
+
+        A set saved again under the same ID replaces the earlier one for
+        readers; the old line stays in its shard.
+
+        Returns:
+            The index entry of the new line
+        """
+        line = (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            if self.shard_count >= self.shard_size:
+                self.shard += 1
+                self.shard_count = 0
+            shard_path = self._shard_path(self.shard)
+            with open(shard_path, 'ab') as file:
+                offset = file.tell()
+                file.write(line)
+            entry = {
+                "id": data["id"],
+                "index": data["index"],
+                "shard": shard_path.name,
+                "shard_number": self.shard,
+                "offset": offset,
+                "length": len(line),
+                "turns": len(data["turns"])
+            }
+            with open(self.index_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+            self.entries[entry["id"]] = entry
+            self.shard_count += 1
+        return entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, set_id: str) -> bool:
+        return set_id in self.entries
+
+    def location(self, set_id: str) -> Optional[str]:
+        """Where a set is stored, as "<shard path>#<id>", or None if it is not in the store"""
+        entry = self.entries.get(set_id)
+        if not entry:
+            return None
+        return f"{self.folder / entry['shard']}#{set_id}"
+
+    def get(self, set_id: str) -> Optional[Dict[str, Any]]:
+        """Read one set by ID"""
+        entry = self.entries.get(set_id)
+        if not entry:
+            return None
+        with open(self.folder / entry["shard"], 'rb') as file:
+            file.seek(entry["offset"])
+            return json.loads(file.read(entry["length"]))
+
+    def iter_sets(self, ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream sets in output index order
+
+        Args:
+            ids: Only read these set IDs (default: every set)
+        """
+        entries = [self.entries[set_id] for set_id in ids if set_id in self.entries] if ids is not None \
+            else list(self.entries.values())
+        entries.sort(key=lambda entry: entry["index"])
+
+        shards = {}
+        try:
+            for entry in entries:
+                file = shards.get(entry["shard"])
+                if file is None:
+                    file = shards[entry["shard"]] = open(self.folder / entry["shard"], 'rb')
+                file.seek(entry["offset"])
+                yield json.loads(file.read(entry["length"]))
+        finally:
+            for file in shards.values():
+                file.close()
+
+    def render(self, set_id: str) -> Optional[str]:
+        """Render a stored set as markdown on demand"""
+        data = self.get(set_id)
+        if data is None:
+            return None
+        return render_markdown(record_from_dict(data), data["index"], data.get("metadata", {}))
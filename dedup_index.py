@@ -0,0 +1,155 @@
+"""
+Near-duplicate detection for generated conversation sets
+
+Each set is reduced to a MinHash signature over word shingles of its title,
+motive and turns. Locality-sensitive hashing on bands of the signature finds
+candidate matches in about constant time per set, and signatures are
+appended to a JSONL file so the index carries over to resumed runs.
+"""
+
+import base64
+import json
+import random
+import re
+import threading
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from conversation_parser import ConversationSetRecord
+
+
+DEDUP_INDEX_FILENAME = "dedup_index.jsonl"
+
+SHINGLE_SIZE = 3  # Words per shingle
+NUM_PERM = 64  # Signature length
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows; sets above ~50% similarity become candidates
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures written by earlier runs must stay comparable
+_rng = random.Random(20240601)
+PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(record: ConversationSetRecord) -> Set[int]:
+    """CRC32 hashes of the word shingles of a set's title, motive and turns"""
+    text = ' '.join([record.title, record.motive] + [turn.text for turn in record.turns])
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {
+        zlib.crc32(' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(hashes: Set[int]) -> array:
+    """MinHash signature of a set of shingle hashes"""
+    return array('I', (
+        min((a * value + b) % _PRIME for value in hashes) & _MAX_HASH
+        for a, b in PERMUTATIONS
+    ))
+
+
+def similarity(first: array, second: array) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+class DedupIndex:
+    """Persistent MinHash/LSH index of the conversation sets saved so far"""
+
+    def __init__(self, path: Path, threshold: float = 0.8):
+        """
+        Load the index, creating it if needed
+
+        Args:
+            path: JSONL file holding one signature per saved set
+            threshold: Estimated similarity at or above which a set is a near-duplicate
+        """
+        self.path = Path(path)
+        self.threshold = threshold
+        self.rows = NUM_PERM // BANDS
+        self.signatures: Dict[str, array] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Load saved signatures, ignoring a line left half-written by a crash"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    signature = array('I')
+                    signature.frombytes(base64.b64decode(entry['signature']))
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue
+                if len(signature) == NUM_PERM:
+                    self._insert(entry['id'], signature)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _bands(self, signature: array) -> List[bytes]:
+        raw = signature.tobytes()
+        size = self.rows * signature.itemsize
+        return [raw[band * size:(band + 1) * size] for band in range(BANDS)]
+
+    def _insert(self, set_id: str, signature: array):
+        # A set saved again under the same ID replaces the earlier one
+        self._remove(set_id)
+        self.signatures[set_id] = signature
+        for buckets, band in zip(self.buckets, self._bands(signature)):
+            buckets.setdefault(band, set()).add(set_id)
+
+    def _remove(self, set_id: str):
+        signature = self.signatures.pop(set_id, None)
+        if signature is None:
+            return
+        for buckets, band in zip(self.buckets, self._bands(signature)):
+            bucket = buckets.get(band)
+            if bucket:
+                bucket.discard(set_id)
+                if not bucket:
+                    del buckets[band]
+
+    def _best_match(self, signature: array, exclude: str) -> Optional[Tuple[str, float]]:
+        candidates = set()
+        for buckets, band in zip(self.buckets, self._bands(signature)):
+            candidates.update(buckets.get(band, ()))
+        candidates.discard(exclude)
+
+        best = None
+        for candidate in candidates:
+            score = similarity(signature, self.signatures[candidate])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+    def check_and_add(self, set_id: str, record: ConversationSetRecord) -> Optional[Tuple[str, float]]:
+        """
+        Add a set unless it is a near-duplicate of one already in the index
+
+        Returns:
+            (ID of the matching set, estimated similarity) if the set was
+            rejected, otherwise None
+        """
+        signature = minhash(shingles(record))
+        with self._lock:
+            match = self._best_match(signature, set_id)
+            if match:
+                return match
+            self._insert(set_id, signature)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({
+                    'id': set_id,
+                    'signature': base64.b64encode(signature.tobytes()).decode('ascii')
+                }) + '\n')
+        return None
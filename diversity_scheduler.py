@@ -0,0 +1,139 @@
+"""
+Steers each batch towards the personas, domain pairs and tool pairs the
+output has used least so far
+"""
+
+import random
+import re
+import threading
+from collections import Counter
+from itertools import combinations
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from conversation_parser import ConversationSetRecord
+
+
+# Persona categories of the system prompt, with words that identify them in a user motive
+DEFAULT_PERSONAS = {
+    "business professional (investor, analyst or executive)": ["investor", "analyst", "executive", "business", "entrepreneur", "founder", "manager"],
+    "researcher (academic, market or technical)": ["researcher", "research", "scientist", "academic", "phd"],
+    "content creator (writer, YouTuber or journalist)": ["creator", "writer", "youtuber", "journalist", "blogger", "podcaster"],
+    "consumer (shopper, traveler or hobbyist)": ["shopper", "traveler", "traveller", "hobbyist", "consumer", "vacation", "trip"],
+    "student or educator": ["student", "teacher", "educator", "professor", "learner"],
+    "healthcare professional": ["doctor", "nurse", "physician", "clinician", "healthcare", "pharmacist"],
+    "tech enthusiast or developer": ["developer", "engineer", "programmer", "enthusiast", "gamer", "tech"],
+}
+
+DEFAULT_DOMAINS = [
+    "Finance", "Technology", "Health & Medicine", "Science & Research", "Travel", "Food & Nutrition",
+    "Entertainment & Media", "Gaming", "Education", "Weather & Environment", "E-Commerce", "Productivity",
+]
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def _words(text: str) -> set:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+class DiversityScheduler:
+    """
+    Counts personas, domain pairs and tool pairs in the saved output and
+    suggests the least used ones for the next batch
+
+    Suggestions are counted as well, so concurrent batches are pointed at
+    different combinations before either has produced output.
+    """
+
+    def __init__(self, personas: Dict[str, List[str]], domains: List[str], tools: List[str],
+                 seed: Optional[int] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            personas: Persona descriptions mapped to words that identify them in a user motive
+            domains: Top-level domains to combine in pairs
+            tools: Available tools to combine in pairs
+            seed: Random seed for breaking ties (default: unseeded)
+        """
+        self.personas = {name: set(keywords) for name, keywords in personas.items()}
+        self.domains = list(domains)
+        self.domain_words = {domain: {word for word in _words(domain) if len(word) > 3} for domain in self.domains}
+        self.tools = set(tools)
+        self.domain_pairs = list(combinations(sorted(self.domains), 2))
+        self.tool_pairs = list(combinations(sorted(self.tools), 2))
+        self.used: Counter = Counter()
+        self.suggested: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['DiversityScheduler']:
+        """Create the scheduler from generation.diversity, or None if it is disabled"""
+        settings = config['generation'].get('diversity') or {}
+        if not settings.get('enabled', False):
+            return None
+        return cls(
+            personas=settings.get('personas') or DEFAULT_PERSONAS,
+            domains=settings.get('domains') or DEFAULT_DOMAINS,
+            tools=config.get('available_tools', []),
+            seed=settings.get('seed')
+        )
+
+    def _classify(self, record: ConversationSetRecord) -> Tuple[List[str], List[str], List[str]]:
+        """Personas, domains and tools of a set, matched against the known ones"""
+        motive_words = _words(record.motive)
+        personas = [name for name, keywords in self.personas.items() if motive_words & keywords]
+
+        domains = []
+        for line in record.domains:
+            label_words = _words(line.split(':', 1)[0])
+            domains.extend(domain for domain, words in self.domain_words.items()
+                           if label_words & words and domain not in domains)
+
+        tools = sorted({tool for turn in record.turns for tool in turn.tools if tool in self.tools})
+        return personas, domains, tools
+
+    def observe(self, record: ConversationSetRecord):
+        """Count the combinations used by a saved set"""
+        personas, domains, tools = self._classify(record)
+        with self._lock:
+            self.used.update(('persona', persona) for persona in personas)
+            self.used.update(('domains', pair) for pair in combinations(sorted(domains), 2))
+            self.used.update(('tools', pair) for pair in combinations(tools, 2))
+
+    def _least_used(self, kind: str, options: List[Any]) -> Any:
+        """Option with the fewest uses and suggestions, ties broken at random"""
+        key = lambda option: (self.used[(kind, option)] + self.suggested[(kind, option)], self._random.random())
+        choice = min(options, key=key)
+        self.suggested[(kind, choice)] += 1
+        return choice
+
+    def suggest(self, num_sets: int, start_index: int) -> str:
+        """
+        Build the user prompt guidance for a batch: one under-used combination per set
+
+        Returns:
+            Guidance text, or "" if there is nothing to suggest
+        """
+        lines = []
+        with self._lock:
+            for number in range(start_index, start_index + num_sets):
+                parts = []
+                if self.personas:
+                    parts.append(f"persona: {self._least_used('persona', list(self.personas))}")
+                if self.domain_pairs:
+                    parts.append(f"domains: {' + '.join(self._least_used('domains', self.domain_pairs))}")
+                if self.tool_pairs:
+                    parts.append(f"include tools: {', '.join(self._least_used('tools', self.tool_pairs))}")
+                if parts:
+                    lines.append(f"- Conversation Set {number}: {'; '.join(parts)}")
+        if not lines:
+            return ""
+        return ("These combinations are under-represented in the dataset so far. Build each set around its "
+                "suggestion, adding any other domains and tools the scenario needs:\n" + '\n'.join(lines))
+
+    def observe_all(self, records: Iterable[ConversationSetRecord]):
+        """Count the sets saved by earlier runs"""
+        for record in records:
+            self.observe(record)
@@ -0,0 +1,196 @@
+"""
+Compact parsed conversation sets and the column layout shared by all exports
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from conversation_parser import ConversationSetRecord, parse_conversation_sets
+from dataset_store import DatasetStore, DATASET_FOLDER, record_from_dict
+
+
+# Turn/Tools column pairs of a new worksheet or file unless a longer set is known up front
+DEFAULT_TURN_COLUMNS = 8
+
+METADATA_COLUMNS = [
+    ('generated_on', "Generated On"),
+    ('provider', "Provider"),
+    ('model', "Model"),
+    ('temperature', "Temperature"),
+]
+
+
+class ParsedSet:
+    """One conversation set flattened to the strings written to a row"""
+
+    __slots__ = ('id', 'title', 'user_motive', 'domains', 'turns', 'tools', 'metadata', 'location')
+
+    def __init__(self, set_id: str, title: str, user_motive: str, domains: str,
+                 turns: Tuple[str, ...], tools: Tuple[str, ...], metadata: Dict[str, str], location: str = ""):
+        self.id = set_id
+        self.title = title
+        self.user_motive = user_motive
+        self.domains = domains
+        self.turns = turns
+        self.tools = tools
+        self.metadata = metadata
+        self.location = location
+
+    @classmethod
+    def from_record(cls, set_id: str, record: ConversationSetRecord, location: str = "") -> 'ParsedSet':
+        return cls(
+            set_id,
+            record.title or "Unknown",
+            record.motive,
+            '\n'.join(record.domains),
+            tuple(turn.text for turn in record.turns),
+            tuple(', '.join(turn.tools) for turn in record.turns),
+            record.metadata,
+            location
+        )
+
+
+def parse_set_file(file_path: str) -> Optional[ParsedSet]:
+    """Parse a conversation set markdown file (module level so worker processes can run it)"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+
+        records = parse_conversation_sets(content)
+        if not records:
+            raise ValueError("no conversation set found")
+
+        # Extract ID from filename
+        file_id = Path(file_path).stem.replace('conversation_set_', '')
+        return ParsedSet.from_record(file_id, records[0], file_path)
+
+    except Exception as e:
+        print(f"❌ Error parsing {file_path}: {e}")
+        return None
+
+
+def parse_dataset_entry(data: Dict[str, Any], location: str = "") -> ParsedSet:
+    """Parse a conversation set read from the dataset store"""
+    return ParsedSet.from_record(data['id'], record_from_dict(data), location)
+
+
+def longest_set(conversation_sets_folder: str) -> Optional[int]:
+    """Most turns of any set in the folder's dataset store, if its index records turn counts"""
+    dataset_folder = Path(conversation_sets_folder) / DATASET_FOLDER
+    if not DatasetStore.exists(dataset_folder):
+        return None
+    entries = DatasetStore(dataset_folder).entries.values()
+    if not entries or any('turns' not in entry for entry in entries):
+        return None
+    return max(entry['turns'] for entry in entries)
+
+
+def iter_parsed_sets(conversation_sets_folder: str, skip: Optional[Callable[[str], bool]] = None,
+                     parse_workers: int = 1) -> Iterator[ParsedSet]:
+    """
+    Yield the sets of an output folder in file order
+
+    Args:
+        conversation_sets_folder: Folder containing conversation set files
+        skip: Returns True for set IDs to leave out; they are skipped before they are read
+        parse_workers: Processes parsing markdown files (1 = parse in this process, 0 = one per CPU)
+    """
+    skip = skip or (lambda set_id: False)
+
+    # Prefer the dataset store: a few sequential shard reads instead of one file per set
+    dataset_folder = Path(conversation_sets_folder) / DATASET_FOLDER
+    if DatasetStore.exists(dataset_folder):
+        store = DatasetStore(dataset_folder)
+        ids = [set_id for set_id in sorted(store.entries) if not skip(set_id)]
+        print(f"📄 Found {len(store)} conversation sets in {dataset_folder}, {len(ids)} to export")
+        for data in store.iter_sets(ids):
+            yield parse_dataset_entry(data, store.location(data['id']))
+        return
+
+    # Find conversation files
+    conversation_files = sorted(Path(conversation_sets_folder).glob("conversation_set_*.md"))
+    paths = [str(file_path) for file_path in conversation_files
+             if not skip(file_path.stem.replace('conversation_set_', ''))]
+    print(f"📄 Found {len(conversation_files)} conversation set files, {len(paths)} to export")
+    workers = min(parse_workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        for parsed in map(parse_set_file, paths):
+            if parsed:
+                yield parsed
+        return
+
+    # Large backfills: hand each worker a few big chunks of files; map keeps the file order
+    print(f"⚡ Parsing with {workers} processes")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for parsed in executor.map(parse_set_file, paths, chunksize=max(1, len(paths) // (workers * 4))):
+            if parsed:
+                yield parsed
+
+
+def turn_columns_in(headers: List[str]) -> int:
+    """Number of Turn/Tools column pairs in an existing header row"""
+    return sum(1 for header in headers if header.startswith("Turn "))
+
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most size items without reading ahead"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, max(1, size)))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RowLayout:
+    """
+    Column layout with a fixed number of Turn/Tools pairs
+
+    The width stays fixed once rows are written so later rows line up with
+    earlier ones. Turns past the last pair are merged into it rather than
+    dropped; folded counts the sets that needed this.
+    """
+
+    def __init__(self, turn_columns: int = DEFAULT_TURN_COLUMNS):
+        self.turn_columns = max(1, turn_columns)
+        self.folded = 0
+        self.headers = ["ID", "Title", "User Motive", "Domains & Subdomains"]
+        for i in range(1, self.turn_columns + 1):
+            self.headers.extend([f"Turn {i}", f"Tools {i}"])
+        self.headers.extend(label for _, label in METADATA_COLUMNS)
+        self.headers.append("File Path")
+
+    def _turn_cells(self, parsed: ParsedSet) -> Tuple[List[str], List[str]]:
+        turns, tools = list(parsed.turns), list(parsed.tools)
+        last = self.turn_columns - 1
+        if len(turns) > self.turn_columns:
+            turns[last:] = ['\n\n'.join(turns[last:])]
+            tools[last:] = ['\n'.join(tool for tool in tools[last:] if tool)]
+            self.folded += 1
+        padding = [""] * (self.turn_columns - len(turns))
+        return turns + padding, tools + padding
+
+    def row(self, parsed: ParsedSet) -> List[str]:
+        """Build the row of one set"""
+        row = [parsed.id, parsed.title, parsed.user_motive, parsed.domains]
+        turns, tools = self._turn_cells(parsed)
+        for turn, tool in zip(turns, tools):
+            row.extend([turn, tool])
+        row.extend(parsed.metadata.get(key, '') for key, _ in METADATA_COLUMNS)
+        row.append(str(parsed.location))
+        return row
+
+    def rows(self, sets: Iterable[ParsedSet]) -> List[List[str]]:
+        return [self.row(parsed) for parsed in sets]
+
+    def columns(self, sets: Iterable[ParsedSet]) -> Dict[str, List[str]]:
+        """Build a batch of sets column by column, keyed by header"""
+        columns: Dict[str, List[str]] = {header: [] for header in self.headers}
+        cells = [columns[header] for header in self.headers]
+        for parsed in sets:
+            for column, value in zip(cells, self.row(parsed)):
+                column.append(value)
+        return columns
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Pluggable exporters for generated conversation sets
+
+Each exporter writes the sets of an output folder to one destination. The
+export section of config.yaml lists the exporters run after every
+generation run; all of them share the row layout of export_rows.
+"""
+
+import csv
+import os
+from pathlib import Path
+from typing import Dict, Any, List
+
+import yaml
+
+from export_rows import DEFAULT_TURN_COLUMNS, RowLayout, iter_chunks, iter_parsed_sets, longest_set
+from google_sheets_exporter import GoogleSheetsExporter
+from retry_policy import RetryPolicy
+
+
+class Exporter:
+    """Base class for export destinations"""
+
+    name = ""
+
+    def export(self, conversation_sets_folder: str) -> bool:
+        """
+        Export every conversation set in a folder
+
+        Returns:
+            True if successful, False otherwise
+        """
+        raise NotImplementedError
+
+
+class GoogleSheetsTarget(Exporter):
+    """Export to Google Sheets with the settings of the google_sheets config section"""
+
+    name = "google_sheets"
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config.get('google_sheets', {})
+
+    def export(self, conversation_sets_folder: str) -> bool:
+        google_sheets_config = self.config
+        if not google_sheets_config.get('enabled', False):
+            print("📊 Google Sheets export is disabled")
+            return True
+
+        print("\n🔄 Exporting to Google Sheets...")
+
+        try:
+            exporter = GoogleSheetsExporter(
+                credentials_file=google_sheets_config.get('credentials_file', 'credentials.json'),
+                retry_policy=RetryPolicy.from_config(google_sheets_config.get('retry'))
+            )
+
+            spreadsheet_url = google_sheets_config.get('spreadsheet_url', '')
+
+            success = exporter.export_conversation_sets(
+                conversation_sets_folder=conversation_sets_folder,
+                spreadsheet_url=spreadsheet_url if spreadsheet_url else None,
+                worksheet_name=google_sheets_config.get('worksheet_name'),
+                start_row=google_sheets_config.get('start_row', 2),
+                # After a streamed run this only catches up on sets the stream could not write
+                incremental=google_sheets_config.get('incremental', True)
+                or google_sheets_config.get('stream_export', False),
+                chunk_size=google_sheets_config.get('chunk_size', 500),
+                parse_workers=google_sheets_config.get('parse_workers', 1),
+                turn_columns=google_sheets_config.get('turn_columns', DEFAULT_TURN_COLUMNS)
+            )
+
+            if success:
+                print("✅ Google Sheets export completed successfully!")
+            else:
+                print("❌ Google Sheets export failed")
+            return success
+
+        except Exception as e:
+            print(f"❌ Google Sheets export error: {e}")
+            print("💡 You can manually export later using: python google_sheets_exporter.py")
+            return False
+
+
+class FileExporter(Exporter):
+    """
+    Rewrite a local file with every set on each export
+
+    The file is written under a temporary name and renamed into place, so
+    readers never see a partial export.
+    """
+
+    extension = ""
+
+    def __init__(self, path: str, turn_columns: int = DEFAULT_TURN_COLUMNS, chunk_size: int = 10000,
+                 parse_workers: int = 1):
+        """
+        Args:
+            path: Destination file; relative paths are inside the exported folder
+            turn_columns: Fewest Turn/Tools column pairs; widened to the longest set when the
+                dataset store index knows it
+            chunk_size: Sets parsed and written at a time
+            parse_workers: Processes parsing markdown files (1 = parse in this process, 0 = one per CPU)
+        """
+        self.path = path
+        self.turn_columns = turn_columns
+        self.chunk_size = max(1, chunk_size)
+        self.parse_workers = parse_workers
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'FileExporter':
+        """Create the exporter from its subsection of the export config section"""
+        settings = config.get('export', {}).get(cls.name, {})
+        return cls(
+            path=settings.get('path', f"conversation_sets.{cls.extension}"),
+            turn_columns=settings.get('turn_columns', DEFAULT_TURN_COLUMNS),
+            chunk_size=settings.get('chunk_size', 10000),
+            parse_workers=settings.get('parse_workers', 1)
+        )
+
+    def export(self, conversation_sets_folder: str) -> bool:
+        path = Path(conversation_sets_folder) / self.path
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        layout = RowLayout(max(self.turn_columns, longest_set(conversation_sets_folder) or 0))
+        print(f"\n🔄 Exporting to {path}...")
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            chunks = iter_chunks(iter_parsed_sets(conversation_sets_folder, parse_workers=self.parse_workers),
+                                 self.chunk_size)
+            exported = self._write(tmp_path, layout, chunks)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            print(f"❌ {self.name.upper()} export error: {e}")
+            return False
+
+        if layout.folded:
+            print(f"⚠️  {layout.folded} sets have more than {layout.turn_columns} turns; "
+                  f"their extra turns were merged into the Turn {layout.turn_columns} column")
+        print(f"✅ Exported {exported} conversation sets to {path}")
+        return True
+
+    def _write(self, path: Path, layout: RowLayout, chunks) -> int:
+        """Write the header and every chunk of parsed sets to path, returning the number of sets"""
+        raise NotImplementedError
+
+
+class CSVExporter(FileExporter):
+    """Export to a CSV file with the same columns as the worksheet"""
+
+    name = "csv"
+    extension = "csv"
+
+    def _write(self, path: Path, layout: RowLayout, chunks) -> int:
+        exported = 0
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(layout.headers)
+            for chunk in chunks:
+                writer.writerows(layout.rows(chunk))
+                exported += len(chunk)
+        return exported
+
+
+class ParquetExporter(FileExporter):
+    """Export to a Parquet file with one string column per worksheet column (requires pyarrow)"""
+
+    name = "parquet"
+    extension = "parquet"
+
+    def _write(self, path: Path, layout: RowLayout, chunks) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+        schema = pa.schema([(header, pa.string()) for header in layout.headers])
+        exported = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            # One row group per chunk, built column by column
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pydict(layout.columns(chunk), schema=schema))
+                exported += len(chunk)
+        return exported
+
+
+EXPORTERS = {
+    "google_sheets": GoogleSheetsTarget,
+    "csv": CSVExporter.from_config,
+    "parquet": ParquetExporter.from_config,
+}
+
+
+def get_exporters(config: Dict[str, Any]) -> List[Exporter]:
+    """Create the exporters listed in the export section of config.yaml (default: Google Sheets only)"""
+    targets = config.get('export', {}).get('targets', ["google_sheets"])
+    unknown = [target for target in targets if target not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Unsupported export targets: {unknown}. Available targets: {list(EXPORTERS.keys())}")
+    return [EXPORTERS[target](config) for target in targets]
+
+
+def main():
+    """Export the configured output folder with every configured exporter"""
+    try:
+        with open('config.yaml', 'r') as f:
+            config = yaml.safe_load(f)
+    except FileNotFoundError:
+        print("❌ config.yaml not found")
+        return False
+
+    folder = config.get('generation', {}).get('output_folder', 'conversation_sets')
+    results = [exporter.export(folder) for exporter in get_exporters(config)]
+    return all(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Atomic file writes, optionally batched on a background thread
+"""
+
+import atexit
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+# always: fsync every file and its directory before moving on
+# batch:  fsync every file, and each directory once per batch of writes
+# never:  leave flushing to the operating system (renames are still atomic)
+FSYNC_POLICIES = ("always", "batch", "never")
+
+_STOP = object()
+
+
+def _fsync_directory(directory: Path):
+    """Make a rename in directory durable (not supported on Windows)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_temp_and_replace(path: Path, content: str, fsync: bool):
+    """Write content next to path under a temporary name, then rename it into place"""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def atomic_write(path: Path, content: str, fsync: str = "always"):
+    """
+    Write a file so readers see either the old or the complete new content
+
+    Args:
+        path: Destination file
+        content: Text to write
+        fsync: One of FSYNC_POLICIES
+    """
+    path = Path(path)
+    _write_temp_and_replace(path, content, fsync != "never")
+    if fsync != "never":
+        _fsync_directory(path.parent)
+
+
+class BackgroundFileWriter:
+    """Writes files atomically on a background thread so callers never wait on the disk"""
+
+    def __init__(self, fsync: str = "batch", max_batch: int = 64):
+        """
+        Start the writer thread
+
+        Args:
+            fsync: One of FSYNC_POLICIES
+            max_batch: Most queued writes handled together
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'. Options: {', '.join(FSYNC_POLICIES)}")
+        self.fsync = fsync
+        self.max_batch = max(1, max_batch)
+        self.errors: List[Tuple[Path, Exception]] = []
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="file-writer", daemon=True)
+        self._thread.start()
+        # Queued writes must not be lost when the program exits
+        atexit.register(self.flush)
+
+    def write(self, path: Path, content: str):
+        """Queue a file to be written"""
+        self._queue.put((Path(path), content))
+
+    def flush(self):
+        """Block until every queued write has been handled"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Finish the queued writes and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch([item for item in batch if item is not _STOP])
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if _STOP in batch:
+                return
+
+    def _write_batch(self, items: List[Tuple[Path, str]]):
+        directories = set()
+        for path, content in items:
+            try:
+                _write_temp_and_replace(path, content, self.fsync != "never")
+                if self.fsync == "always":
+                    _fsync_directory(path.parent)
+                directories.add(path.parent)
+            except OSError as e:
+                self.errors.append((path, e))
+                print(f"❌ Failed to write {path}: {e}")
+
+        if self.fsync == "batch":
+            for directory in directories:
+                _fsync_directory(directory)
@@ -6,26 +6,36 @@ Google Sheets exporter for conversation sets
 import gspread
 import json
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from datetime import datetime
 from pathlib import Path
-import re
 import yaml
 
+from export_rows import (
+    DEFAULT_TURN_COLUMNS, ParsedSet, RowLayout, iter_chunks, iter_parsed_sets, longest_set,
+    parse_dataset_entry, parse_set_file, turn_columns_in
+)
+from retry_policy import RetryPolicy
+from sheets_client import SheetsClient
+from sheets_sync import SheetsSyncState, SYNC_STATE_FILENAME
+
 
 class GoogleSheetsExporter:
     """Export conversation sets to Google Sheets"""
     
-    def __init__(self, credentials_file: str = "credentials.json"):
+    def __init__(self, credentials_file: str = "credentials.json", retry_policy: Optional[RetryPolicy] = None):
         """
         Initialize the Google Sheets exporter
         
         Args:
             credentials_file: Path to the Google service account credentials JSON file
+            retry_policy: Backoff for Sheets API quota and transient errors
         """
         self.credentials_file = credentials_file
         self.gc = None
         self._authenticate()
+        self.client = SheetsClient(self.gc, retry_policy)
+        self.layout = RowLayout()
     
     def _authenticate(self):
         """Authenticate with Google Sheets API"""
@@ -68,11 +78,8 @@ class GoogleSheetsExporter:
             return None
         
         try:
-            if spreadsheet_url.startswith('https://'):
-                spreadsheet = self.gc.open_by_url(spreadsheet_url)
-            else:
-                # Assume it's a spreadsheet ID
-                spreadsheet = self.gc.open_by_key(spreadsheet_url)
+            # Opens by ID unless given a URL
+            spreadsheet = self.client.open(spreadsheet_url)
             print(f"✅ Opened spreadsheet: {spreadsheet.title}")
             return spreadsheet
         except Exception as e:
@@ -91,210 +98,217 @@ class GoogleSheetsExporter:
     def get_or_create_worksheet(self, spreadsheet, worksheet_name: str):
         """Get or create worksheet with given name"""
         try:
-            worksheet = spreadsheet.worksheet(worksheet_name)
+            worksheet = self.client.call(spreadsheet.worksheet, worksheet_name)
             print(f"✅ Using existing worksheet: {worksheet_name}")
             return worksheet
         except gspread.WorksheetNotFound:
             # Create new worksheet
-            worksheet = spreadsheet.add_worksheet(title=worksheet_name, rows=1000, cols=26)
+            worksheet = self.client.call(spreadsheet.add_worksheet, title=worksheet_name, rows=1000,
+                                         cols=len(self.layout.headers))
             print(f"✅ Created new worksheet: {worksheet_name}")
             return worksheet
     
-    def setup_headers(self, worksheet, start_row: int = 1):
-        """Setup column headers"""
-        headers = [
-            "ID", "Title", "User Motive", "Domains & Subdomains",
-            "Turn 1", "Tools 1", "Turn 2", "Tools 2",
-            "Turn 3", "Tools 3", "Turn 4", "Tools 4",
-            "Turn 5", "Tools 5", "Turn 6", "Tools 6",
-            "Turn 7", "Tools 7", "Turn 8", "Tools 8",
-            "Generated On", "Provider", "Model", "Temperature", "File Path"
-        ]
+    def setup_headers(self, sync_state: Optional[SheetsSyncState] = None, turn_columns: int = DEFAULT_TURN_COLUMNS):
+        """
+        Pick the column layout of the target worksheet and make sure row 1 holds its headers
+        
+        A worksheet that already received rows keeps the layout recorded in
+        sync_state and is not checked again, and existing headers are kept
+        as they are. An empty row 1 gets the headers in the same request as
+        the first rows written.
+        
+        Args:
+            sync_state: Sync watermark of the target worksheet
+            turn_columns: Turn/Tools column pairs of a new layout
+        """
+        if sync_state and sync_state.exported_ids and sync_state.turn_columns:
+            self.layout = RowLayout(sync_state.turn_columns)
+            return
+        
+        try:
+            # Check if headers already exist
+            existing_headers = self.client.row_values(1)
+        except Exception:
+            existing_headers = None
         
-        # Only add headers if starting at row 1
-        if start_row == 1:
-            try:
-                # Check if headers already exist
-                existing_headers = worksheet.row_values(1)
-                if not existing_headers or existing_headers[0] != "ID":
-                    worksheet.insert_row(headers, 1)
-                    print("✅ Headers added to worksheet")
-            except Exception:
-                worksheet.insert_row(headers, 1)
+        if existing_headers and existing_headers[0] == "ID":
+            self.layout = RowLayout(turn_columns_in(existing_headers) or turn_columns)
+        else:
+            self.layout = RowLayout(turn_columns)
+            if existing_headers == []:
+                self.client.pending_header = self.layout.headers
+            else:
+                self.client.insert_row(self.layout.headers, 1)
                 print("✅ Headers added to worksheet")
+        if sync_state:
+            sync_state.turn_columns = self.layout.turn_columns
     
-    def parse_conversation_file(self, file_path: str) -> Dict[str, Any]:
+    def parse_conversation_file(self, file_path: str) -> Optional[ParsedSet]:
         """Parse a conversation set markdown file"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            # Extract metadata
-            metadata = {}
-            lines = content.split('\n')
-            for line in lines[:10]:
-                if line.startswith('**Generated on:**'):
-                    metadata['generated_on'] = line.replace('**Generated on:**', '').strip()
-                elif line.startswith('**Provider:**'):
-                    metadata['provider'] = line.replace('**Provider:**', '').strip()
-                elif line.startswith('**Model:**'):
-                    metadata['model'] = line.replace('**Model:**', '').strip()
-                elif line.startswith('**Temperature:**'):
-                    metadata['temperature'] = line.replace('**Temperature:**', '').strip()
-            
-            # Extract title
-            title_match = re.search(r'# Conversation Set \d+:\s*(.+)', content)
-            title = title_match.group(1).strip() if title_match else "Unknown"
-            
-            # Extract user motive
-            motive_match = re.search(r'\*\*User Motive:\*\*\s*(.+)', content)
-            user_motive = motive_match.group(1).strip() if motive_match else ""
-            
-            # Extract domains
-            domains_match = re.search(r'\*\*Domains & Subdomains:\*\*\s*(.+)', content)
-            domains = domains_match.group(1).strip() if domains_match else ""
-            
-            # Extract conversation turns and tools
-            turns = []
-            tools = []
-            
-            # Find all "User:" and "Tools used:" patterns
-            user_pattern = r'User:\s*(.+?)(?=\n\n|\nTools used:|Assistant:)'
-            tool_pattern = r'Tools used:\s*(.+?)(?=\n\n|\nUser:|Assistant:)'
-            
-            user_matches = re.findall(user_pattern, content, re.DOTALL)
-            tool_matches = re.findall(tool_pattern, content, re.DOTALL)
-            
-            # Process up to 8 turns
-            for i in range(min(8, len(user_matches))):
-                turns.append(user_matches[i].strip())
-                tools.append(tool_matches[i].strip() if i < len(tool_matches) else "")
-            
-            # Pad with empty strings if less than 8 turns
-            while len(turns) < 8:
-                turns.append("")
-                tools.append("")
-            
-            # Extract ID from filename
-            file_id = Path(file_path).stem.replace('conversation_set_', '')
+        return parse_set_file(file_path)
+    
+    def parse_dataset_entry(self, data: Dict[str, Any], location: str = "") -> ParsedSet:
+        """Parse a conversation set read from the dataset store"""
+        return parse_dataset_entry(data, location)
+    
+    def build_row(self, parsed: ParsedSet) -> List[str]:
+        """Build the spreadsheet row of a parsed conversation set in the target's layout"""
+        return self.layout.row(parsed)
+    
+    def iter_new_sets(self, conversation_sets_folder: str,
+                      sync_state: Optional[SheetsSyncState] = None,
+                      parse_workers: int = 1) -> Iterator[ParsedSet]:
+        """
+        Yield every set not exported yet, in file order
+        
+        Sets recorded in sync_state are skipped before they are read.
+        
+        Args:
+            conversation_sets_folder: Folder containing conversation set files
+            sync_state: Sync watermark of the export target
+            parse_workers: Processes parsing markdown files (1 = parse in this process, 0 = one per CPU)
+        """
+        return iter_parsed_sets(conversation_sets_folder, sync_state.is_exported if sync_state else None,
+                                parse_workers)
+    
+    def write_rows(self, rows: List[List[str]], start_row: int,
+                   sync_state: Optional[SheetsSyncState] = None, chunk_size: int = 500) -> int:
+        """
+        Write rows to the opened worksheet in chunks, recording each chunk in the sync state once it is written
+        
+        Args:
+            rows: Rows to write; the first column is the set ID
+            start_row: Row to write the first row to (1 = append after existing data)
+            sync_state: Sync watermark to update after every chunk
+            chunk_size: Rows per Sheets API request
             
-            return {
-                'id': file_id,
-                'title': title,
-                'user_motive': user_motive,
-                'domains': domains,
-                'turns': turns,
-                'tools': tools,
-                'metadata': metadata
-            }
+        Returns:
+            The next free row
+        """
+        next_row = start_row
+        for offset in range(0, len(rows), max(1, chunk_size)):
+            chunk = rows[offset:offset + chunk_size]
+            if start_row == 1:
+                # Append after existing data
+                self.client.append_rows(chunk)
+            else:
+                self.client.write_rows(next_row, chunk)
+                next_row += len(chunk)
             
-        except Exception as e:
-            print(f"❌ Error parsing {file_path}: {e}")
-            return None
+            if sync_state:
+                sync_state.mark_exported((row[0] for row in chunk), next_row if start_row != 1 else None)
+        return next_row
     
-    def export_conversation_sets(self, 
-                                conversation_sets_folder: str = "conversation_sets",
-                                spreadsheet_url: str = None,
-                                worksheet_name: str = "Conversation Sets",
-                                start_row: int = 2) -> bool:
+    def open_worksheet(self, spreadsheet_url: str, worksheet_name: str,
+                       sync_state: Optional[SheetsSyncState] = None,
+                       turn_columns: int = DEFAULT_TURN_COLUMNS) -> Optional[Tuple[Any, Any]]:
         """
-        Export all conversation sets to Google Sheets
+        Open the export target, make it the target of write_rows and make sure it has headers
         
         Args:
-            conversation_sets_folder: Folder containing conversation set files
-            spreadsheet_url: URL of the target spreadsheet
+            spreadsheet_url: URL or ID of the target spreadsheet
             worksheet_name: Name of the worksheet to write to
-            start_row: Row number to start writing data
+            sync_state: Sync watermark of the target worksheet
+            turn_columns: Turn/Tools column pairs if the worksheet has no layout yet
             
         Returns:
-            True if successful, False otherwise
+            (spreadsheet, worksheet), or None if the target cannot be opened
         """
         if not self.gc:
             print("❌ Not authenticated with Google Sheets")
-            return False
+            return None
         
         if not spreadsheet_url:
             print("❌ Spreadsheet URL is required")
-            return False
+            return None
         
         # Open spreadsheet
         spreadsheet = self.open_spreadsheet(spreadsheet_url)
         if not spreadsheet:
-            return False
+            return None
         
         # Get or create worksheet
         worksheet = self.get_or_create_worksheet(spreadsheet, worksheet_name)
         if not worksheet:
-            return False
+            return None
         
         # Setup headers
-        self.setup_headers(worksheet, start_row if start_row == 1 else 1)
+        self.client.use_worksheet(worksheet)
+        self.setup_headers(sync_state, turn_columns)
+        return spreadsheet, worksheet
+    
+    def export_conversation_sets(self, 
+                                conversation_sets_folder: str = "conversation_sets",
+                                spreadsheet_url: str = None,
+                                worksheet_name: str = "Conversation Sets",
+                                start_row: int = 2,
+                                incremental: bool = True,
+                                chunk_size: int = 500,
+                                parse_workers: int = 1,
+                                turn_columns: int = DEFAULT_TURN_COLUMNS) -> bool:
+        """
+        Export conversation sets to Google Sheets
         
-        # Find conversation files
-        conversation_files = list(Path(conversation_sets_folder).glob("conversation_set_*.md"))
-        if not conversation_files:
-            print(f"❌ No conversation set files found in {conversation_sets_folder}")
+        Args:
+            conversation_sets_folder: Folder containing conversation set files
+            spreadsheet_url: URL of the target spreadsheet
+            worksheet_name: Name of the worksheet to write to
+            start_row: Row number to start writing data
+            incremental: Only export sets not recorded in the folder's sync state file
+            chunk_size: Rows per Sheets API request
+            parse_workers: Processes parsing markdown files (1 = parse in this process, 0 = one per CPU)
+            turn_columns: Fewest Turn/Tools column pairs of a new worksheet; widened to the
+                longest set when the dataset store index knows it
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        sync_state = SheetsSyncState(Path(conversation_sets_folder) / SYNC_STATE_FILENAME,
+                                     spreadsheet_url, worksheet_name)
+        if not incremental:
+            sync_state.reset()
+        
+        calls_before = self.client.calls
+        turn_columns = max(turn_columns, longest_set(conversation_sets_folder) or 0)
+        target = self.open_worksheet(spreadsheet_url, worksheet_name, sync_state, turn_columns)
+        if not target:
             return False
+        spreadsheet, worksheet = target
         
-        print(f"📄 Found {len(conversation_files)} conversation set files")
+        # Continue below the rows written by earlier exports
+        first_row = start_row if start_row == 1 else max(start_row, sync_state.next_row or start_row)
+        next_row = first_row
+        exported = 0
+        try:
+            # Parse, build and write one chunk at a time so memory does not grow with the export
+            for chunk in iter_chunks(self.iter_new_sets(conversation_sets_folder, sync_state, parse_workers),
+                                     chunk_size):
+                next_row = self.write_rows(self.layout.rows(chunk), next_row, sync_state, chunk_size)
+                exported += len(chunk)
+                print(f"📊 Exported {exported} rows")
+        except Exception as e:
+            print(f"❌ Failed to write to Google Sheets: {e}")
+            print("💡 Chunks written before the failure are recorded; the next export continues from there")
+            print(f"📡 Sheets API calls: {self.client.calls - calls_before}")
+            return False
         
-        # Parse files and prepare data
-        rows_to_add = []
-        for file_path in sorted(conversation_files):
-            parsed_data = self.parse_conversation_file(str(file_path))
-            if parsed_data:
-                # Create row data
-                row_data = [
-                    parsed_data['id'],
-                    parsed_data['title'],
-                    parsed_data['user_motive'],
-                    parsed_data['domains']
-                ]
-                
-                # Add turns and tools
-                for i in range(8):
-                    row_data.extend([
-                        parsed_data['turns'][i],
-                        parsed_data['tools'][i]
-                    ])
-                
-                # Add metadata
-                metadata = parsed_data['metadata']
-                row_data.extend([
-                    metadata.get('generated_on', ''),
-                    metadata.get('provider', ''),
-                    metadata.get('model', ''),
-                    metadata.get('temperature', ''),
-                    str(file_path)
-                ])
-                
-                rows_to_add.append(row_data)
+        if self.layout.folded:
+            print(f"⚠️  {self.layout.folded} sets have more than {self.layout.turn_columns} turns; "
+                  f"their extra turns were merged into the Turn {self.layout.turn_columns} column")
         
-        # Write data to spreadsheet
-        if rows_to_add:
-            try:
-                # Determine where to write data
-                if start_row == 1:
-                    # Append after existing data
-                    worksheet.append_rows(rows_to_add)
-                else:
-                    # Write starting from specific row
-                    range_start = f"A{start_row}"
-                    worksheet.update(range_name=range_start, values=rows_to_add)
-                
-                print(f"✅ Successfully exported {len(rows_to_add)} conversation sets to Google Sheets")
-                print(f"📊 Data written starting from row {start_row}")
-                print(f"📊 Spreadsheet URL: {spreadsheet.url}")
-                return True
-                
-            except Exception as e:
-                print(f"❌ Failed to write to Google Sheets: {e}")
-                return False
+        if exported:
+            print(f"✅ Successfully exported {exported} conversation sets to Google Sheets")
+            print(f"📊 Data written starting from row {first_row}")
+            print(f"📊 Spreadsheet URL: {spreadsheet.url}")
+            print(f"📡 Sheets API calls: {self.client.calls - calls_before}")
+            return True
+        elif sync_state.exported_ids:
+            print("✅ Google Sheets is already up to date")
+            return True
         else:
             print("❌ No valid conversation sets to export")
             return False
 
-
 def main():
     """Main function for testing the Google Sheets exporter"""
     print("🔄 Exporting conversation sets...")
@@ -314,7 +328,10 @@ def main():
         return False
     
     # Initialize exporter
-    exporter = GoogleSheetsExporter(gs_config.get('credentials_file', 'credentials.json'))
+    exporter = GoogleSheetsExporter(
+        gs_config.get('credentials_file', 'credentials.json'),
+        retry_policy=RetryPolicy.from_config(gs_config.get('retry'))
+    )
     
     if not exporter.gc:
         print("❌ Authentication failed")
@@ -325,7 +342,11 @@ def main():
         conversation_sets_folder='conversation_sets',
         spreadsheet_url=gs_config.get('spreadsheet_url'),
         worksheet_name=gs_config.get('worksheet_name', 'Conversation Sets'),
-        start_row=gs_config.get('start_row', 2)
+        start_row=gs_config.get('start_row', 2),
+        incremental=gs_config.get('incremental', True),
+        chunk_size=gs_config.get('chunk_size', 500),
+        parse_workers=gs_config.get('parse_workers', 1),
+        turn_columns=gs_config.get('turn_columns', DEFAULT_TURN_COLUMNS)
     )
     
     if success:
@@ -3,101 +3,613 @@ LLM Providers module for handling different AI model APIs
 """
 
 import os
-from typing import Dict, Any, Optional
+import json
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Callable
 import openai
 import anthropic
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from rate_limiter import RateLimiter
+from retry_policy import (
+    RetryPolicy, ProviderError, TransientError,
+    classify_status, parse_retry_after
+)
+
+
+# Batch job states reported by get_batch_status
+BATCH_IN_PROGRESS = "in_progress"
+BATCH_ENDED = "ended"  # Finished (possibly with some failed requests); results can be fetched
+BATCH_FAILED = "failed"  # The job as a whole failed; there are no results
+
+# Name under which the response schema is sent (OpenAI schema name, Anthropic tool name)
+STRUCTURED_OUTPUT_NAME = "conversation_sets"
+
+# Finish reasons meaning the completion was cut off at max_tokens
+# (OpenAI, Anthropic and Gemini spellings)
+TRUNCATED_FINISH_REASONS = {"length", "max_tokens", "MAX_TOKENS"}
+
+
+@dataclass
+class GenerationResult:
+    """Generated text plus the usage and timing data of the call that produced it"""
+    
+    text: str
+    input_tokens: int = 0  # Includes cached input tokens
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    cache_write_tokens: int = 0
+    latency: float = 0.0  # Seconds spent in the successful provider call
+    finish_reason: Optional[str] = None
+    
+    @property
+    def truncated(self) -> bool:
+        """Whether the completion stopped because it hit max_tokens"""
+        return self.finish_reason in TRUNCATED_FINISH_REASONS
 
 
 class LLMProvider:
     """Base class for LLM providers"""
     
-    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000):
+    # Whether the provider implements submit_batch/get_batch_status/get_batch_results
+    supports_batch_api = False
+    
+    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None):
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.base_url = base_url or None
+        # JSON schema the output must follow; None asks for free-form text
+        self.response_schema = response_schema
+    
+    def estimate_tokens(self, system_prompt: str, user_prompt: str) -> int:
+        """
+        Estimate the tokens a request counts against the tokens-per-minute quota
+        
+        Providers reserve max_tokens for the completion up front, so it is
+        counted in full alongside a rough 4-characters-per-token prompt size.
+        """
+        return (len(system_prompt) + len(user_prompt)) // 4 + self.max_tokens
+    
+    def generate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        """
+        Generate text using the LLM
+        
+        Rate-limited and transient failures are retried according to the
+        retry policy; anything else is raised as a ProviderError subclass.
+        """
+        def attempt():
+            if self.rate_limiter:
+                self.rate_limiter.acquire(self.estimate_tokens(system_prompt, user_prompt))
+            started = time.monotonic()
+            result = self._generate(system_prompt, user_prompt)
+            result.latency = time.monotonic() - started
+            return result
+        
+        return self.retry_policy.run(attempt)
     
-    def generate(self, system_prompt: str, user_prompt: str) -> str:
-        """Generate text using the LLM"""
+    def generate_stream(self, system_prompt: str, user_prompt: str,
+                        on_text: Callable[[str], None]) -> GenerationResult:
+        """
+        Generate text using the LLM, passing each chunk to on_text as it arrives
+        
+        A failure before any text has arrived is retried like generate. Once
+        chunks have been handed to on_text, retrying would repeat them, so
+        the error is raised without retrying.
+        
+        Returns:
+            The complete generated text with its usage data
+        """
+        received = []
+        
+        def forward(chunk: str):
+            received.append(chunk)
+            on_text(chunk)
+        
+        def attempt():
+            if self.rate_limiter:
+                self.rate_limiter.acquire(self.estimate_tokens(system_prompt, user_prompt))
+            started = time.monotonic()
+            try:
+                result = self._generate_stream(system_prompt, user_prompt, forward)
+                result.latency = time.monotonic() - started
+                return result
+            except ProviderError as e:
+                if received and e.retryable:
+                    raise ProviderError(f"{e} (after {len(''.join(received))} streamed characters)",
+                                        e.status_code) from e
+                raise
+        
+        return self.retry_policy.run(attempt)
+    
+    async def agenerate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        """Generate text using the LLM without blocking the event loop"""
+        async def attempt():
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async(self.estimate_tokens(system_prompt, user_prompt))
+            started = time.monotonic()
+            result = await self._agenerate(system_prompt, user_prompt)
+            result.latency = time.monotonic() - started
+            return result
+        
+        return await self.retry_policy.arun(attempt)
+    
+    def _run_with_retry(self, func: Callable[[], Any]) -> Any:
+        """Call func with SDK errors classified and retried like generate calls"""
+        def attempt():
+            try:
+                return func()
+            except ProviderError:
+                raise
+            except Exception as e:
+                raise self._classify_error(e) from e
+        
+        return self.retry_policy.run(attempt)
+    
+    def submit_batch(self, requests: Dict[str, Tuple[str, str]]) -> str:
+        """
+        Submit many requests as a single provider Batch API job
+        
+        Args:
+            requests: Maps a custom request ID to its (system_prompt, user_prompt)
+            
+        Returns:
+            The provider's batch job ID
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support the Batch API")
+    
+    def get_batch_status(self, batch_id: str) -> str:
+        """Return BATCH_IN_PROGRESS, BATCH_ENDED or BATCH_FAILED for a batch job"""
+        raise NotImplementedError(f"{type(self).__name__} does not support the Batch API")
+    
+    def get_batch_results(self, batch_id: str) -> Dict[str, GenerationResult]:
+        """Return the result of every request of a finished job that succeeded, by custom ID"""
+        raise NotImplementedError(f"{type(self).__name__} does not support the Batch API")
+    
+    def _classify_error(self, error: Exception) -> ProviderError:
+        """
+        Convert an SDK exception into a RateLimitedError, TransientError or FatalError
+        
+        Errors the provider does not recognise become a plain ProviderError,
+        which is neither retried nor treated as fatal for the run.
+        """
+        if isinstance(error, ProviderError):
+            return error
+        return ProviderError(str(error))
+    
+    def _generate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        """Send a single request to the provider"""
         raise NotImplementedError
+    
+    def _generate_stream(self, system_prompt: str, user_prompt: str,
+                         on_text: Callable[[str], None]) -> GenerationResult:
+        """
+        Send a single streaming request to the provider
+        
+        Providers that support streaming override this; the fallback delivers
+        the whole completion as one chunk.
+        """
+        result = self._generate(system_prompt, user_prompt)
+        on_text(result.text)
+        return result
+    
+    async def _agenerate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        """
+        Send a single request to the provider from async code
+        
+        Providers with an async SDK client override this; the fallback runs
+        the blocking call on a worker thread.
+        """
+        return await asyncio.to_thread(self._generate, system_prompt, user_prompt)
+
+
+def _classify_sdk_error(sdk, label: str, error: Exception) -> ProviderError:
+    """Classify exceptions from the OpenAI and Anthropic SDKs, which share an error hierarchy"""
+    message = f"{label} API error: {str(error)}"
+    if isinstance(error, sdk.APIStatusError):
+        return classify_status(message, error.status_code, parse_retry_after(error.response.headers))
+    if isinstance(error, sdk.APIConnectionError):  # Includes timeouts
+        return TransientError(message)
+    return ProviderError(message)
 
 
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT provider"""
     
-    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000):
-        super().__init__(api_key, model, temperature, max_tokens)
-        self.client = openai.OpenAI(api_key=api_key)
+    supports_batch_api = True
+    batch_endpoint = "/v1/chat/completions"
+    
+    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None):
+        super().__init__(api_key, model, temperature, max_tokens, rate_limiter, retry_policy, base_url,
+                         response_schema)
+        # Retries are handled by our retry policy, not the SDK
+        self.client = openai.OpenAI(api_key=api_key, base_url=self.base_url, max_retries=0)
+        self.async_client = openai.AsyncOpenAI(api_key=api_key, base_url=self.base_url, max_retries=0)
     
-    def generate(self, system_prompt: str, user_prompt: str) -> str:
+    def _classify_error(self, error: Exception) -> ProviderError:
+        return _classify_sdk_error(openai, "OpenAI", error)
+    
+    def _request_params(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """Build the chat completion request shared by the sync and async paths"""
+        params = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        if self.response_schema:
+            params["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": STRUCTURED_OUTPUT_NAME, "strict": True, "schema": self.response_schema}
+            }
+        return params
+    
+    def _build_result(self, text: str, usage: Any, finish_reason: Optional[str]) -> GenerationResult:
+        """Build a result, counting prompt tokens served from OpenAI's automatic cache"""
+        if not usage:
+            return GenerationResult(text=text, finish_reason=finish_reason)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return GenerationResult(
+            text=text,
+            input_tokens=usage.prompt_tokens or 0,
+            output_tokens=usage.completion_tokens or 0,
+            cached_input_tokens=getattr(details, 'cached_tokens', 0) or 0,
+            finish_reason=finish_reason
+        )
+    
+    def _generate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
         try:
             response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
+                **self._request_params(system_prompt, user_prompt)
+            )
+            choice = response.choices[0]
+            # content is null when the model refuses
+            return self._build_result(choice.message.content or "", response.usage, choice.finish_reason)
+        except Exception as e:
+            raise self._classify_error(e) from e
+    
+    def _generate_stream(self, system_prompt: str, user_prompt: str,
+                         on_text: Callable[[str], None]) -> GenerationResult:
+        try:
+            stream = self.client.chat.completions.create(
+                **self._request_params(system_prompt, user_prompt),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            chunks = []
+            usage = None
+            finish_reason = None
+            for chunk in stream:
+                if chunk.choices:
+                    if chunk.choices[0].delta.content:
+                        chunks.append(chunk.choices[0].delta.content)
+                        on_text(chunk.choices[0].delta.content)
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+            return self._build_result(''.join(chunks), usage, finish_reason)
+        except Exception as e:
+            raise self._classify_error(e) from e
+    
+    async def _agenerate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._request_params(system_prompt, user_prompt)
             )
-            return response.choices[0].message.content
+            choice = response.choices[0]
+            # content is null when the model refuses
+            return self._build_result(choice.message.content or "", response.usage, choice.finish_reason)
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise self._classify_error(e) from e
+    
+    def submit_batch(self, requests: Dict[str, Tuple[str, str]]) -> str:
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": self.batch_endpoint,
+                "body": self._request_params(system_prompt, user_prompt)
+            })
+            for custom_id, (system_prompt, user_prompt) in requests.items()
+        ]
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        
+        batch_file = self._run_with_retry(
+            lambda: self.client.files.create(file=("batch_requests.jsonl", payload), purpose="batch")
+        )
+        batch = self._run_with_retry(
+            lambda: self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint=self.batch_endpoint,
+                completion_window="24h"
+            )
+        )
+        return batch.id
+    
+    def get_batch_status(self, batch_id: str) -> str:
+        batch = self._run_with_retry(lambda: self.client.batches.retrieve(batch_id))
+        if batch.status in ("completed", "expired", "cancelled"):
+            # Expired and cancelled jobs still return the requests that finished
+            return BATCH_ENDED
+        if batch.status == "failed":
+            return BATCH_FAILED
+        return BATCH_IN_PROGRESS
+    
+    def get_batch_results(self, batch_id: str) -> Dict[str, GenerationResult]:
+        batch = self._run_with_retry(lambda: self.client.batches.retrieve(batch_id))
+        if not batch.output_file_id:
+            return {}
+        content = self._run_with_retry(lambda: self.client.files.content(batch.output_file_id))
+        
+        results = {}
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    continue
+                body = response["body"]
+                usage = body.get("usage") or {}
+                choice = body["choices"][0]
+                results[item["custom_id"]] = GenerationResult(
+                    # content is null when the model refuses
+                    text=choice["message"].get("content") or "",
+                    input_tokens=usage.get("prompt_tokens", 0),
+                    output_tokens=usage.get("completion_tokens", 0),
+                    cached_input_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+                    finish_reason=choice.get("finish_reason")
+                )
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError, AttributeError) as e:
+                print(f"⚠️  Skipping unreadable batch result line: {e}")
+        return results
 
 
 class AnthropicProvider(LLMProvider):
     """Anthropic Claude provider"""
     
-    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000):
-        super().__init__(api_key, model, temperature, max_tokens)
-        self.client = anthropic.Anthropic(api_key=api_key)
+    supports_batch_api = True
+    
+    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None):
+        super().__init__(api_key, model, temperature, max_tokens, rate_limiter, retry_policy, base_url,
+                         response_schema)
+        # Retries are handled by our retry policy, not the SDK
+        self.client = anthropic.Anthropic(api_key=api_key, base_url=self.base_url, max_retries=0)
+        self.async_client = anthropic.AsyncAnthropic(api_key=api_key, base_url=self.base_url, max_retries=0)
+    
+    def _classify_error(self, error: Exception) -> ProviderError:
+        return _classify_sdk_error(anthropic, "Anthropic", error)
+    
+    def _request_params(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """
+        Build the messages request shared by the sync, async and batch paths
+        
+        The system prompt is identical for every batch, so it is marked as a
+        cacheable prefix; only the short user prompt is billed as new input
+        after the first call.
+        """
+        params = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "system": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {"role": "user", "content": user_prompt}
+            ]
+        }
+        if self.response_schema:
+            # Structured output: force a call to a tool whose input is the schema
+            params["tools"] = [{
+                "name": STRUCTURED_OUTPUT_NAME,
+                "description": "Save the generated conversation sets",
+                "input_schema": self.response_schema
+            }]
+            params["tool_choice"] = {"type": "tool", "name": STRUCTURED_OUTPUT_NAME}
+        return params
+    
+    def _build_result(self, message: Any) -> GenerationResult:
+        """Build a result from a message, counting prompt cache reads and writes"""
+        tool_inputs = [block.input for block in message.content if block.type == "tool_use"]
+        if tool_inputs:
+            text = json.dumps(tool_inputs[0])
+        else:
+            text = ''.join(block.text for block in message.content if block.type == "text")
+        usage = message.usage
+        cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        return GenerationResult(
+            text=text,
+            input_tokens=(usage.input_tokens or 0) + cache_read + cache_write,
+            output_tokens=usage.output_tokens or 0,
+            cached_input_tokens=cache_read,
+            cache_write_tokens=cache_write,
+            finish_reason=message.stop_reason
+        )
     
-    def generate(self, system_prompt: str, user_prompt: str) -> str:
+    def _generate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
         try:
             response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
+                **self._request_params(system_prompt, user_prompt)
             )
-            return response.content[0].text
+            return self._build_result(response)
+        except Exception as e:
+            raise self._classify_error(e) from e
+    
+    def _generate_stream(self, system_prompt: str, user_prompt: str,
+                         on_text: Callable[[str], None]) -> GenerationResult:
+        try:
+            with self.client.messages.stream(**self._request_params(system_prompt, user_prompt)) as stream:
+                for text in stream.text_stream:
+                    on_text(text)
+                return self._build_result(stream.get_final_message())
         except Exception as e:
-            raise Exception(f"Anthropic API error: {str(e)}")
+            raise self._classify_error(e) from e
+    
+    async def _agenerate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        try:
+            response = await self.async_client.messages.create(
+                **self._request_params(system_prompt, user_prompt)
+            )
+            return self._build_result(response)
+        except Exception as e:
+            raise self._classify_error(e) from e
+    
+    def submit_batch(self, requests: Dict[str, Tuple[str, str]]) -> str:
+        batch = self._run_with_retry(
+            lambda: self.client.messages.batches.create(
+                requests=[
+                    {"custom_id": custom_id, "params": self._request_params(system_prompt, user_prompt)}
+                    for custom_id, (system_prompt, user_prompt) in requests.items()
+                ]
+            )
+        )
+        return batch.id
+    
+    def get_batch_status(self, batch_id: str) -> str:
+        batch = self._run_with_retry(lambda: self.client.messages.batches.retrieve(batch_id))
+        return BATCH_ENDED if batch.processing_status == "ended" else BATCH_IN_PROGRESS
+    
+    def get_batch_results(self, batch_id: str) -> Dict[str, GenerationResult]:
+        entries = self._run_with_retry(lambda: list(self.client.messages.batches.results(batch_id)))
+        return {
+            entry.custom_id: self._build_result(entry.result.message)
+            for entry in entries
+            if entry.result.type == "succeeded"
+        }
 
 
 class GoogleProvider(LLMProvider):
     """Google Gemini provider"""
     
-    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000):
-        super().__init__(api_key, model, temperature, max_tokens)
-        genai.configure(api_key=api_key)
+    def __init__(self, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None):
+        super().__init__(api_key, model, temperature, max_tokens, rate_limiter, retry_policy, base_url,
+                         response_schema)
+        genai.configure(
+            api_key=api_key,
+            client_options={"api_endpoint": self.base_url} if self.base_url else None
+        )
         self.model_instance = genai.GenerativeModel(model)
+    
+    def _generation_config(self) -> Any:
+        """
+        Build the generation parameters for a request
         
-        # Configure generation parameters
-        self.generation_config = genai.types.GenerationConfig(
-            temperature=temperature,
-            max_output_tokens=max_tokens
+        Built per request so max_tokens changes made during a run take effect.
+        """
+        if not self.response_schema:
+            return genai.types.GenerationConfig(
+                temperature=self.temperature,
+                max_output_tokens=self.max_tokens
+            )
+        return genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens,
+            response_mime_type="application/json",
+            response_schema=_gemini_schema(self.response_schema)
+        )
+    
+    def _classify_error(self, error: Exception) -> ProviderError:
+        message = f"Google API error: {str(error)}"
+        if isinstance(error, google_exceptions.GoogleAPICallError):
+            return classify_status(message, error.code)
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return TransientError(message)
+        return ProviderError(message)
+    
+    def _combined_prompt(self, system_prompt: str, user_prompt: str) -> str:
+        """
+        Combine system and user prompts for Gemini
+        
+        The system prompt comes first so every request shares the same
+        prefix, which Gemini's implicit caching can reuse.
+        """
+        return f"System: {system_prompt}\n\nUser: {user_prompt}"
+    
+    def _build_result(self, response: Any, text: str) -> GenerationResult:
+        """Build a result, counting prompt tokens served from Gemini's cache"""
+        finish_reason = None
+        if response.candidates:
+            reason = response.candidates[0].finish_reason
+            finish_reason = getattr(reason, 'name', str(reason))
+        usage = getattr(response, 'usage_metadata', None)
+        return GenerationResult(
+            text=text,
+            input_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+            output_tokens=getattr(usage, 'candidates_token_count', 0) or 0,
+            cached_input_tokens=getattr(usage, 'cached_content_token_count', 0) or 0,
+            finish_reason=finish_reason
         )
     
-    def generate(self, system_prompt: str, user_prompt: str) -> str:
+    def _generate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        try:
+            response = self.model_instance.generate_content(
+                self._combined_prompt(system_prompt, user_prompt),
+                generation_config=self._generation_config()
+            )
+            return self._build_result(response, response.text)
+        except Exception as e:
+            raise self._classify_error(e) from e
+    
+    def _generate_stream(self, system_prompt: str, user_prompt: str,
+                         on_text: Callable[[str], None]) -> GenerationResult:
         try:
-            # Combine system and user prompts for Gemini
-            combined_prompt = f"System: {system_prompt}\n\nUser: {user_prompt}"
-            
             response = self.model_instance.generate_content(
-                combined_prompt,
-                generation_config=self.generation_config
+                self._combined_prompt(system_prompt, user_prompt),
+                generation_config=self._generation_config(),
+                stream=True
             )
-            return response.text
+            chunks = []
+            for chunk in response:
+                if chunk.parts:
+                    chunks.append(chunk.text)
+                    on_text(chunk.text)
+            return self._build_result(response, ''.join(chunks))
         except Exception as e:
-            raise Exception(f"Google API error: {str(e)}")
+            raise self._classify_error(e) from e
+    
+    async def _agenerate(self, system_prompt: str, user_prompt: str) -> GenerationResult:
+        try:
+            response = await self.model_instance.generate_content_async(
+                self._combined_prompt(system_prompt, user_prompt),
+                generation_config=self._generation_config()
+            )
+            return self._build_result(response, response.text)
+        except Exception as e:
+            raise self._classify_error(e) from e
+
+
+def _gemini_schema(schema: Any) -> Any:
+    """Copy a JSON schema without the keywords Gemini's schema type does not support"""
+    if isinstance(schema, dict):
+        return {key: _gemini_schema(value) for key, value in schema.items() if key != "additionalProperties"}
+    if isinstance(schema, list):
+        return [_gemini_schema(item) for item in schema]
+    return schema
 
 
-def get_provider(provider_name: str, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000) -> LLMProvider:
+def get_provider(provider_name: str, api_key: str, model: str, temperature: float = 0.7, max_tokens: int = 4000,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None) -> LLMProvider:
     """Factory function to get the appropriate LLM provider"""
     
     providers = {
@@ -109,4 +621,5 @@ def get_provider(provider_name: str, api_key: str, model: str, temperature: floa
     if provider_name not in providers:
         raise ValueError(f"Unsupported provider: {provider_name}. Available providers: {list(providers.keys())}")
     
-    return providers[provider_name](api_key, model, temperature, max_tokens)
+    return providers[provider_name](api_key, model, temperature, max_tokens, rate_limiter, retry_policy, base_url,
+                                    response_schema)
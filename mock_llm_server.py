@@ -0,0 +1,242 @@
+"""
+Local mock of the OpenAI chat completions and Batch APIs
+
+Serves canned conversation sets so interactive and bulk runs can be tried
+without an API account. Start it and point llm.base_url at the printed URL
+(with llm.provider set to "openai" and any OPENAI_API_KEY):
+
+    python mock_llm_server.py --port 8000
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+
+DEFAULT_TOOLS = ["yahoo_finance", "arxiv_search", "github", "news_api", "calculator", "google_search"]
+
+REQUEST_PATTERN = re.compile(r"exactly (\d+) conversation sets?, numbered Conversation Set (\d+)")
+
+
+def _make_set(number: int, tools: List[str], rng: random.Random) -> Dict[str, Any]:
+    """One conversation set that meets the default validation rules"""
+    topic = rng.choice(["chip makers", "solar storage", "vaccine trials", "rail travel", "indie games"])
+    turns = []
+    for turn in range(1, 7):
+        turn_tools = rng.sample(tools, min(4, len(tools)))
+        turns.append({
+            "text": f"Step {turn} of the {topic} review: compare figure {rng.randint(1, 10 ** 6)} "
+                    f"against source {rng.randint(1, 10 ** 6)} and summarize what changed.",
+            "tools": turn_tools
+        })
+    return {
+        "title": f"{topic.title()} Review {rng.randint(1, 10 ** 6)}",
+        "user_motive": f"The user is an analyst researching {topic} for a report.",
+        "domains": ["Finance: Stocks, Market Analysis", "Technology: Research"],
+        "turns": turns
+    }
+
+
+def _render_text(sets: List[Dict[str, Any]], start_index: int) -> str:
+    """Render sets in the plain text format the system prompt asks for"""
+    blocks = []
+    for number, conversation_set in enumerate(sets, start_index):
+        lines = [f"Conversation Set {number}: {conversation_set['title']}",
+                 f"User Motive: {conversation_set['user_motive']}",
+                 "Domains & Subdomains:"]
+        lines.extend(conversation_set['domains'])
+        lines.append("Trajectory:")
+        for turn in conversation_set['turns']:
+            lines.append(turn['text'])
+            lines.append(f"Tools: {', '.join(turn['tools'])}")
+        blocks.append('\n'.join(lines))
+    return '\n\n'.join(blocks)
+
+
+class MockState:
+    """Uploaded files, batch jobs and response settings shared by all requests"""
+
+    def __init__(self, tools: List[str], refusal_rate: float = 0.0, seed: Optional[int] = None):
+        self.tools = tools
+        self.refusal_rate = refusal_rate
+        self.files: Dict[str, str] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()  # Held while run_batch answers a job's requests
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a chat completion request with as many sets as the user prompt asks for"""
+        user_prompt = next((m['content'] for m in body.get('messages', []) if m.get('role') == 'user'), '')
+        match = REQUEST_PATTERN.search(user_prompt)
+        num_sets, start_index = (int(match.group(1)), int(match.group(2))) if match else (1, 1)
+        with self.lock:
+            refused = self.random.random() < self.refusal_rate
+            sets = [_make_set(number, self.tools, self.random)
+                    for number in range(start_index, start_index + num_sets)]
+
+        if refused:
+            # Refusals come back with null content, as from the real API
+            message = {"role": "assistant", "content": None, "refusal": "I can't help with that."}
+        elif body.get('response_format', {}).get('type') == 'json_schema':
+            message = {"role": "assistant", "content": json.dumps({"conversation_sets": sets})}
+        else:
+            message = {"role": "assistant", "content": _render_text(sets, start_index)}
+        prompt_tokens = sum(len(m.get('content') or '') for m in body.get('messages', [])) // 4
+        completion_tokens = len(message['content'] or '') // 4
+        return {
+            "id": f"chatcmpl-mock-{self.random.randint(0, 10 ** 9)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'mock'),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    def run_batch(self, batch_id: str):
+        """Answer every request of a batch job and store the results as its output file"""
+        batch = self.batches[batch_id]
+        lines = []
+        for line in self.files[batch['input_file_id']].splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            lines.append(json.dumps({
+                "id": f"batch_req_{len(lines)}",
+                "custom_id": request['custom_id'],
+                "response": {"status_code": 200, "request_id": f"req_{len(lines)}",
+                             "body": self.completion(request['body'])},
+                "error": None
+            }))
+        output_file_id = f"file-{batch_id}-output"
+        self.files[output_file_id] = '\n'.join(lines) + '\n'
+        batch.update(status="completed", output_file_id=output_file_id, completed_at=int(time.time()))
+
+
+def _multipart_file(content_type: str, data: bytes) -> str:
+    """Content of the "file" field of a multipart upload"""
+    boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+    for part in data.split(b'--' + boundary):
+        headers, _, content = part.partition(b'\r\n\r\n')
+        if b'name="file"' in headers:
+            return content[:-2].decode('utf-8') if content.endswith(b'\r\n') else content.decode('utf-8')
+    return ''
+
+
+def make_handler(state: MockState):
+    """Request handler class bound to the shared mock state"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, payload: Any, status: int = 200):
+            body = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/octet-stream' if isinstance(payload, str)
+                             else 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_found(self):
+            self._send({"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}}, 404)
+
+        def do_POST(self):
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            path = self.path.rstrip('/')
+            if path.endswith('/chat/completions'):
+                self._send(state.completion(json.loads(data)))
+            elif path.endswith('/files'):
+                with state.lock:
+                    file_id = f"file-{len(state.files)}"
+                    state.files[file_id] = _multipart_file(self.headers.get('Content-Type', ''), data)
+                self._send({"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                            "filename": "batch.jsonl", "purpose": "batch", "status": "processed"})
+            elif path.endswith('/batches'):
+                request = json.loads(data)
+                with state.lock:
+                    batch_id = f"batch_{len(state.batches)}"
+                    state.batches[batch_id] = {
+                        "id": batch_id, "object": "batch", "endpoint": request['endpoint'],
+                        "input_file_id": request['input_file_id'],
+                        "completion_window": request.get('completion_window', '24h'),
+                        "status": "in_progress", "created_at": int(time.time()), "output_file_id": None
+                    }
+                self._send(state.batches[batch_id])
+            else:
+                self._not_found()
+
+        def do_GET(self):
+            path = self.path.rstrip('/')
+            batch_match = re.search(r'/batches/([^/]+)$', path)
+            content_match = re.search(r'/files/([^/]+)/content$', path)
+            if batch_match and batch_match.group(1) in state.batches:
+                batch_id = batch_match.group(1)
+                with state.lock:
+                    # Jobs finish on their first status check
+                    if state.batches[batch_id]['status'] == 'in_progress':
+                        state.run_batch(batch_id)
+                self._send(state.batches[batch_id])
+            elif content_match and content_match.group(1) in state.files:
+                self._send(state.files[content_match.group(1)])
+            else:
+                self._not_found()
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, tools: Optional[List[str]] = None,
+          refusal_rate: float = 0.0, seed: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    Create the mock server (call serve_forever() on the result to run it)
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 = any free port)
+        tools: Tools the canned sets use (default: a built-in list)
+        refusal_rate: Share of responses that come back as refusals with null content
+        seed: Random seed for the canned sets (default: unseeded)
+
+    Returns:
+        The server; its base URL is http://{host}:{server.server_port}/v1
+    """
+    state = MockState(tools or DEFAULT_TOOLS, refusal_rate, seed)
+    return ThreadingHTTPServer((host, port), make_handler(state))
+
+
+def main():
+    """Run the mock server until interrupted"""
+    parser = argparse.ArgumentParser(description="Serve a local mock of the OpenAI chat and Batch APIs")
+    parser.add_argument('--host', default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on")
+    parser.add_argument('--config', default="config.yaml", help="Config whose available_tools the sets use")
+    parser.add_argument('--refusal-rate', type=float, default=0.0,
+                        help="Share of responses returned as refusals with null content")
+    parser.add_argument('--seed', type=int, help="Random seed for the canned sets")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, 'r') as f:
+            tools = (yaml.safe_load(f) or {}).get('available_tools') or DEFAULT_TOOLS
+    except FileNotFoundError:
+        tools = DEFAULT_TOOLS
+
+    server = serve(args.host, args.port, tools, args.refusal_rate, args.seed)
+    print(f"🧪 Mock LLM server listening, set llm.base_url to http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Mock LLM server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,16 @@
 System prompts for generating function calling conversation sets
 """
 
+import os
+import threading
 import yaml
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# Built prompts keyed by absolute config path. Each entry remembers the
+# config and example file signatures it was built from.
+_prompt_cache: Dict[str, Tuple[Any, str, Any, str]] = {}
+_prompt_cache_lock = threading.Lock()
 
 
 def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
@@ -66,13 +74,50 @@ def format_tools_list(tools: List[str]) -> str:
     return '\n'.join(formatted_tools)
 
 
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Modification time and size of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
 def get_conversation_generator_prompt(config_path: str = "config.yaml") -> str:
-    """Generate the dynamic system prompt based on configuration"""
+    """
+    Generate the dynamic system prompt based on configuration
+    
+    The prompt is only rebuilt when the config file or the example
+    conversation file changes; otherwise the cached prompt is returned.
+    """
+    cache_key = os.path.abspath(config_path)
+    config_signature = _file_signature(config_path)
+    
+    with _prompt_cache_lock:
+        cached = _prompt_cache.get(cache_key)
+    if cached:
+        cached_config_signature, example_file, cached_example_signature, prompt = cached
+        if cached_config_signature == config_signature and _file_signature(example_file) == cached_example_signature:
+            return prompt
+    
     config = load_config(config_path)
+    example_file = config.get('example_conversation_file', 'conversation_sets/example_conversation_set.md')
+    example_signature = _file_signature(example_file)
+    prompt = build_conversation_generator_prompt(config)
     
+    with _prompt_cache_lock:
+        _prompt_cache[cache_key] = (config_signature, example_file, example_signature, prompt)
+    return prompt
+
+
+def build_conversation_generator_prompt(config: Dict[str, Any]) -> str:
+    """
+    Build the system prompt from an already loaded configuration
+    
+    The system prompt must not change between batches so providers can
+    cache it; anything that varies per batch goes in the user prompt.
+    """
     # Extract configuration values
-    num_sets = config.get('generation', {}).get('batch_size', 5)
-    total_sets = config.get('generation', {}).get('num_conversation_sets', 100)
     available_tools = config.get('available_tools', [])
     example_file = config.get('example_conversation_file', 'conversation_sets/example_conversation_set.md')
     example_conversation = load_example_conversation(example_file)
@@ -80,7 +125,7 @@ def get_conversation_generator_prompt(config_path: str = "config.yaml") -> str:
     # Format the tools list
     tools_list = format_tools_list(available_tools)
     
-    return f"""You are an expert at creating complex, realistic function calling conversation sets for training AI assistants. Your task is to generate {num_sets} sophisticated multi-turn conversations that demonstrate advanced function calling patterns.
+    return f"""You are an expert at creating complex, realistic function calling conversation sets for training AI assistants. Your task is to generate sophisticated multi-turn conversations that demonstrate advanced function calling patterns.
 
 REQUIREMENTS:
 1. Each conversation set must include:
@@ -141,7 +186,7 @@ EXAMPLE CONVERSATION SET:
 {example_conversation}
 
 GENERATION INSTRUCTIONS:
-Generate {num_sets} unique, complex function calling conversation sets following the rules andn format above. Each conversation set should:
+Generate the requested number of unique, complex function calling conversation sets following the rules and format above. Each conversation set should:
 - Explore different domain combinations
 - Demonstrate unique tool usage patterns
 - Have atleast 6 conversational turns that build logically
@@ -152,7 +197,37 @@ Ensure variety in:
 - Tool usage patterns and complexity
 - Conversation flow and dependencies
 
-Number each conversation set sequentially and make each one distinct and valuable for training purposes. Generate conversation sets that are sophisticated, realistic, natural and demonstrate complex function calling patterns that would challenge and train an AI assistant effectively."""
+Number each conversation set sequentially and make each one distinct and valuable for training purposes. Generate conversation sets that are sophisticated, realistic, natural and demonstrate complex function calling patterns that would challenge and train an AI assistant effectively.{get_output_format_instructions(config)}"""
+
+
+def get_output_format_instructions(config: Dict[str, Any]) -> str:
+    """Extra system prompt instructions for the configured output format"""
+    if config.get('generation', {}).get('output_format', 'text') != 'json':
+        return ""
+    return """
+
+OUTPUT FORMAT:
+Return the conversation sets as JSON matching the provided schema, one entry in "conversation_sets" per set. Put the title in "title", the user motive in "user_motive", one "Domain: Subdomains" line per entry in "domains", and one entry per turn in "turns" with the user's message in "text" and the tools that turn needs in "tools". The format rules above describe what goes into each field; do not add the "Conversation Set X:", "User Motive:" or "Tools:" labels inside the JSON values."""
+
+
+def get_conversation_user_prompt(num_sets: int, start_index: int = 1, guidance: str = "") -> str:
+    """
+    Build the per-call user prompt that goes with the cached system prompt
+    
+    Args:
+        num_sets: Exact number of conversation sets to generate
+        start_index: Number of the first conversation set
+        guidance: Per-batch steering appended to the request; kept out of the
+            system prompt so the cached prefix stays identical across calls
+    """
+    if num_sets == 1:
+        prompt = f"Generate exactly 1 conversation set, numbered Conversation Set {start_index}."
+    else:
+        prompt = (f"Generate exactly {num_sets} conversation sets, numbered Conversation Set {start_index} "
+                  f"to Conversation Set {start_index + num_sets - 1}.")
+    if guidance:
+        prompt += f"\n\n{guidance}"
+    return prompt
 
 
 def get_default_example() -> str:
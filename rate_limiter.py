@@ -0,0 +1,111 @@
+"""
+Token-bucket rate limiting for LLM provider calls
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at a fixed rate"""
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 1.0):
+        """
+        Initialize the bucket
+
+        Args:
+            rate_per_minute: Sustained number of units allowed per minute
+            burst_seconds: How many seconds of quota may be spent at once
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount units from the bucket and return how long to wait before using them
+
+        The bucket is allowed to go negative, so a request larger than the
+        burst capacity still goes through once the debt has been paid back
+        and callers are served in the order they reserved.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter for one provider/model"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 burst_seconds: float = 1.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve one request and the given number of tokens, returning the wait time"""
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0):
+        """Block until a request using the given number of tokens is allowed"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait on the event loop until a request using the given number of tokens is allowed"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# Limiters are shared per (provider, model) so every caller in the process
+# draws from the same quota
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(config: Dict[str, Any], provider_name: str, model: str) -> Optional[RateLimiter]:
+    """
+    Get the shared rate limiter configured for a provider and model
+
+    Limits are read from config['rate_limits'][provider][model], falling back
+    to config['rate_limits'][provider]['default']. Returns None if no limits
+    are configured.
+    """
+    provider_limits = (config.get('rate_limits') or {}).get(provider_name) or {}
+    limits = provider_limits.get(model) or provider_limits.get('default')
+    if not limits:
+        return None
+
+    requests_per_minute = limits.get('requests_per_minute')
+    tokens_per_minute = limits.get('tokens_per_minute')
+    if not requests_per_minute and not tokens_per_minute:
+        return None
+
+    with _limiters_lock:
+        key = (provider_name, model)
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                burst_seconds=limits.get('burst_seconds', 1.0)
+            )
+        return _limiters[key]
@@ -0,0 +1,152 @@
+"""
+Provider error classification and retry policy for LLM calls
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+
+T = TypeVar('T')
+
+
+class ProviderError(Exception):
+    """Base class for errors raised by LLM providers"""
+
+    retryable = False
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class RateLimitedError(ProviderError):
+    """The provider rejected the request because a quota was exceeded (HTTP 429)"""
+
+    retryable = True
+
+
+class TransientError(ProviderError):
+    """A temporary failure such as a timeout, dropped connection or 5xx response"""
+
+    retryable = True
+
+
+class FatalError(ProviderError):
+    """A failure that retrying will not fix, such as an invalid key or a bad request"""
+
+    retryable = False
+
+
+def classify_status(message: str, status_code: Optional[int], retry_after: Optional[float] = None) -> ProviderError:
+    """Map an HTTP status code to the matching provider error type"""
+    if status_code == 429:
+        return RateLimitedError(message, status_code, retry_after)
+    if status_code is None or status_code in (408, 409) or status_code >= 500:
+        return TransientError(message, status_code, retry_after)
+    return FatalError(message, status_code, retry_after)
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """
+    Read the delay requested by the server from response headers
+
+    Supports the non-standard retry-after-ms header as well as Retry-After
+    given either in seconds or as an HTTP date.
+    """
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Retry rate-limited and transient provider errors with jittered exponential backoff"""
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Initialize the retry policy
+
+        Args:
+            max_attempts: Total number of attempts, including the first one
+            base_delay: Backoff ceiling in seconds for the first retry
+            max_delay: Upper bound for the exponential backoff ceiling
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, retry_config: Optional[Dict[str, Any]]) -> 'RetryPolicy':
+        """Create a retry policy from the llm.retry section of config.yaml"""
+        retry_config = retry_config or {}
+        return cls(
+            max_attempts=retry_config.get('max_attempts', 5),
+            base_delay=retry_config.get('base_delay', 1.0),
+            max_delay=retry_config.get('max_delay', 60.0)
+        )
+
+    def compute_delay(self, attempt: int, error: ProviderError) -> float:
+        """
+        Compute how long to wait before the given retry attempt (1-based)
+
+        Uses full jitter so concurrent callers that failed together do not
+        retry together. A Retry-After sent by the server is always honored.
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after + random.uniform(0, self.base_delay))
+        return delay
+
+    def _should_retry(self, error: ProviderError, attempt: int) -> bool:
+        return error.retryable and attempt < self.max_attempts
+
+    def run(self, func: Callable[[], T]) -> T:
+        """Call func, retrying retryable provider errors"""
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except ProviderError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self.compute_delay(attempt, e)
+                print(f"⚠️  {e} - retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_attempts})")
+                time.sleep(delay)
+                attempt += 1
+
+    async def arun(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Await func(), retrying retryable provider errors"""
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except ProviderError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self.compute_delay(attempt, e)
+                print(f"⚠️  {e} - retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_attempts})")
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,153 @@
+"""
+Append-only run journal used to resume interrupted generation runs
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any
+
+
+class RunJournal:
+    """Records every completed batch so a crashed run can continue where it stopped"""
+
+    def __init__(self, path: Path):
+        """
+        Initialize the journal, loading any entries from a previous run
+
+        Args:
+            path: Path of the JSONL journal file
+        """
+        self.path = Path(path)
+        self.entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Load existing entries, ignoring a line left half-written by a crash"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self.entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+    def reset(self):
+        """Discard the journal and start a fresh run"""
+        with self._lock:
+            self.entries = []
+            if self.path.exists():
+                self.path.unlink()
+
+    def _append(self, entry: Dict[str, Any]):
+        """Append an entry and make sure it reaches the disk"""
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            self.entries.append(entry)
+
+    def record_reservation(self, start_index: int, requested: int):
+        """
+        Record that a batch was started for an index block
+
+        If the process dies before the batch is recorded as complete, the
+        reservation tells the next run which indices may hold finished files.
+        """
+        self._append({
+            "event": "reserve",
+            "start_index": start_index,
+            "requested": requested
+        })
+
+    def record_batch(self, start_index: int, requested: int, files: List[str], next_index: int):
+        """
+        Record a completed batch
+
+        Args:
+            start_index: First output index reserved for the batch
+            requested: Number of sets the batch asked for
+            files: Files the batch saved
+            next_index: First output index that is free after this batch
+        """
+        self._append({
+            "event": "batch",
+            "start_index": start_index,
+            "requested": requested,
+            "files": files,
+            "next_index": next_index,
+            "completed_at": datetime.now().isoformat()
+        })
+
+    def record_batch_job(self, batch_id: str, blocks: Dict[str, List[int]]):
+        """
+        Record a submitted provider Batch API job
+
+        Args:
+            batch_id: The provider's job ID
+            blocks: Maps each request's custom ID to its [start_index, requested]
+        """
+        self._append({
+            "event": "batch_job",
+            "batch_id": batch_id,
+            "blocks": blocks
+        })
+
+    def record_batch_job_done(self, batch_id: str):
+        """Record that a Batch API job's results have been collected"""
+        self._append({
+            "event": "batch_job_done",
+            "batch_id": batch_id
+        })
+
+    def record_run_complete(self, generated: int):
+        """Record that the run produced every requested set, so the next run starts over"""
+        self._append({
+            "event": "run_complete",
+            "generated": generated,
+            "completed_at": datetime.now().isoformat()
+        })
+
+    def is_run_complete(self) -> bool:
+        """Whether the last run recorded in the journal finished"""
+        return bool(self.entries) and self.entries[-1].get('event') == 'run_complete'
+
+    def pending_batch_jobs(self) -> List[Dict[str, Any]]:
+        """Submitted Batch API jobs whose results were never collected"""
+        done = {entry['batch_id'] for entry in self.entries if entry.get('event') == 'batch_job_done'}
+        return [entry for entry in self.entries
+                if entry.get('event') == 'batch_job' and entry['batch_id'] not in done]
+
+    def _batches(self) -> List[Dict[str, Any]]:
+        return [entry for entry in self.entries if entry.get('event', 'batch') == 'batch']
+
+    def unfinished_reservations(self) -> List[Dict[str, Any]]:
+        """Reservations whose batch was never recorded as complete"""
+        completed = {entry['start_index'] for entry in self._batches()}
+        return [entry for entry in self.entries
+                if entry.get('event') == 'reserve' and entry['start_index'] not in completed]
+
+    def is_batch_complete(self, start_index: int) -> bool:
+        """Whether the batch reserved at start_index has been recorded as complete"""
+        return any(entry['start_index'] == start_index for entry in self._batches())
+
+    def completed_files(self) -> List[str]:
+        """
+        Files saved by earlier batches that are still on disk
+
+        Dataset store locations ("<shard path>#<id>") count as long as their shard exists.
+        """
+        return [path for entry in self._batches() for path in entry['files']
+                if os.path.exists(path.split('#', 1)[0])]
+
+    def next_index(self) -> int:
+        """First output index not used by any completed batch"""
+        return max((entry['next_index'] for entry in self._batches()), default=1)
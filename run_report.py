@@ -0,0 +1,145 @@
+"""
+Per-batch and per-run token, latency and cost accounting
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from file_writer import atomic_write
+from llm_providers import GenerationResult, TRUNCATED_FINISH_REASONS
+
+
+USAGE_FIELDS = ("input_tokens", "cached_input_tokens", "cache_write_tokens", "output_tokens")
+
+
+class RunReport:
+    """Collects the usage of every batch of a run and writes it as a machine-readable report"""
+
+    def __init__(self, model: str, pricing: Optional[Dict[str, Any]] = None, cost_multiplier: float = 1.0):
+        """
+        Initialize the report
+
+        Args:
+            model: Model name, used to look up its prices
+            pricing: The pricing section of config.yaml (USD per 1M tokens by model)
+            cost_multiplier: Factor applied to every cost, e.g. 0.5 for Batch API discounts
+        """
+        self.model = model
+        self.prices = (pricing or {}).get(model)
+        self.cost_multiplier = cost_multiplier
+        self.batches: List[Dict[str, Any]] = []
+        self.failed_requests = 0
+        self.duplicate_sets = 0
+        self.invalid_sets = 0
+        self.violations: Dict[str, int] = {}
+        self.started_at = datetime.now()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def cost(self, result: GenerationResult) -> Optional[float]:
+        """Cost of one call in USD, or None if the model has no configured prices"""
+        if not self.prices:
+            return None
+        input_price = self.prices.get('input', 0.0)
+        uncached = result.input_tokens - result.cached_input_tokens - result.cache_write_tokens
+        cost = (
+            uncached * input_price
+            + result.cached_input_tokens * self.prices.get('cached_input', input_price)
+            + result.cache_write_tokens * self.prices.get('cache_write', input_price)
+            + result.output_tokens * self.prices.get('output', 0.0)
+        ) / 1_000_000
+        return cost * self.cost_multiplier
+
+    def record_batch(self, start_index: int, requested: int, saved: int,
+                     result: Optional[GenerationResult] = None):
+        """
+        Record one batch request
+
+        Args:
+            start_index: First output index reserved for the batch
+            requested: Number of sets the batch asked for
+            saved: Number of sets that were saved
+            result: The provider result, if the call returned one
+        """
+        entry = {"start_index": start_index, "requested": requested, "saved": saved}
+        if result is not None:
+            for field in USAGE_FIELDS:
+                entry[field] = getattr(result, field)
+            entry["latency"] = round(result.latency, 3)
+            entry["finish_reason"] = result.finish_reason
+            entry["cost_usd"] = self.cost(result)
+        with self._lock:
+            self.batches.append(entry)
+
+    def record_failure(self):
+        """Record a batch request that failed without a result"""
+        with self._lock:
+            self.failed_requests += 1
+
+    def record_duplicate(self):
+        """Record a generated set that was rejected as a near-duplicate"""
+        with self._lock:
+            self.duplicate_sets += 1
+
+    def record_invalid(self, rules: List[str]):
+        """Record a generated set that was rejected for breaking validation rules"""
+        with self._lock:
+            self.invalid_sets += 1
+            for rule in rules:
+                self.violations[rule] = self.violations.get(rule, 0) + 1
+
+    def totals(self) -> Dict[str, Any]:
+        """Aggregate usage, cost and throughput over all recorded batches"""
+        with self._lock:
+            batches = list(self.batches)
+            failed_requests = self.failed_requests
+            duplicate_sets = self.duplicate_sets
+            invalid_sets = self.invalid_sets
+            violations = dict(self.violations)
+
+        with_result = [batch for batch in batches if "finish_reason" in batch]
+        totals = {
+            "requests": len(with_result),
+            "failed_requests": failed_requests,
+            "truncated_requests": sum(
+                1 for batch in with_result if batch["finish_reason"] in TRUNCATED_FINISH_REASONS
+            ),
+            "requested_sets": sum(batch["requested"] for batch in batches),
+            "saved_sets": sum(batch["saved"] for batch in batches),
+            "duplicate_sets": duplicate_sets,
+            "invalid_sets": invalid_sets,
+            "violations": violations,
+        }
+        for field in USAGE_FIELDS:
+            totals[field] = sum(batch[field] for batch in with_result)
+        totals["latency"] = round(sum(batch["latency"] for batch in with_result), 3)
+
+        costs = [batch["cost_usd"] for batch in with_result]
+        totals["cost_usd"] = sum(costs) if costs and None not in costs else None
+
+        saved = totals["saved_sets"]
+        totals["output_tokens_per_set"] = round(totals["output_tokens"] / saved, 1) if saved else None
+        totals["cost_per_set_usd"] = totals["cost_usd"] / saved if saved and totals["cost_usd"] is not None else None
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The full report: run totals followed by every batch"""
+        with self._lock:
+            batches = sorted(self.batches, key=lambda batch: batch["start_index"])
+        return {
+            "model": self.model,
+            "started_at": self.started_at.isoformat(),
+            "wall_time": round(time.monotonic() - self._started, 3),
+            "totals": self.totals(),
+            "batches": batches
+        }
+
+    def write(self, path: Path) -> Dict[str, Any]:
+        """Write the report as JSON and return it"""
+        report = self.to_dict()
+        atomic_write(path, json.dumps(report, indent=2))
+        return report
@@ -0,0 +1,156 @@
+"""
+Quota-aware Google Sheets API calls for exports
+"""
+
+from typing import Any, Callable, List, Optional
+
+import gspread
+import requests
+
+from retry_policy import RetryPolicy, ProviderError, TransientError, classify_status, parse_retry_after
+
+
+def classify_api_error(error: Exception) -> Optional[ProviderError]:
+    """Map a gspread or network error to the matching retry error type (None = not an API failure)"""
+    if isinstance(error, gspread.exceptions.APIError):
+        response = getattr(error, 'response', None)
+        return classify_status(
+            f"Google Sheets API error: {error}",
+            getattr(response, 'status_code', None),
+            parse_retry_after(getattr(response, 'headers', None))
+        )
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return TransientError(f"Google Sheets API error: {error}")
+    return None
+
+
+class SheetsClient:
+    """
+    Sheets API calls of one export target
+
+    Every call is counted and retried on quota (429) and transient errors;
+    appends are only retried on quota errors.
+    Row writes go through a single spreadsheet batch_update that grows the
+    grid, writes a pending header row and writes the data together.
+    """
+
+    def __init__(self, gc: Any, retry_policy: Optional[RetryPolicy] = None):
+        """
+        Initialize the client
+
+        Args:
+            gc: Authenticated gspread client
+            retry_policy: Backoff for rate-limited and transient errors
+        """
+        self.gc = gc
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.calls = 0
+        self.spreadsheet = None
+        self.worksheet = None
+        self.row_count = 0
+        self.col_count = 0
+        self.pending_header: Optional[List[str]] = None  # Written together with the next rows
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Make one API call, retrying quota and transient errors"""
+        return self._run(func, args, kwargs, retry_transient=True)
+
+    def call_once(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Make a call that is not idempotent, retrying only quota errors
+
+        A timeout or 5xx may come after the server applied the request, so
+        retrying it could apply it twice. A 429 means it was not applied.
+        """
+        return self._run(func, args, kwargs, retry_transient=False)
+
+    def _run(self, func: Callable[..., Any], args: tuple, kwargs: dict, retry_transient: bool) -> Any:
+        def attempt():
+            self.calls += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                classified = classify_api_error(e)
+                if classified is None:
+                    raise
+                if isinstance(classified, TransientError) and not retry_transient:
+                    classified.retryable = False
+                raise classified from e
+
+        return self.retry_policy.run(attempt)
+
+    def open(self, spreadsheet_url: str) -> Any:
+        """Open a spreadsheet by URL or ID"""
+        if spreadsheet_url.startswith('https://'):
+            self.spreadsheet = self.call(self.gc.open_by_url, spreadsheet_url)
+        else:
+            self.spreadsheet = self.call(self.gc.open_by_key, spreadsheet_url)
+        return self.spreadsheet
+
+    def use_worksheet(self, worksheet: Any):
+        """Make worksheet the target of row reads and writes"""
+        self.worksheet = worksheet
+        self.row_count = worksheet.row_count
+        self.col_count = worksheet.col_count
+
+    def row_values(self, row: int) -> List[str]:
+        return self.call(self.worksheet.row_values, row)
+
+    def insert_row(self, values: List[str], row: int):
+        self.call(self.worksheet.insert_row, values, row)
+        self.row_count += 1
+
+    def append_rows(self, rows: List[List[str]]):
+        """Append rows after the existing data, preceded by the pending header"""
+        if self.pending_header:
+            rows = [self.pending_header] + rows
+        grow_columns = self._grow_columns(rows)
+        if grow_columns:
+            self.call(self.spreadsheet.batch_update, {'requests': [grow_columns]})
+            self.col_count = self._width(rows)
+        self.call_once(self.worksheet.append_rows, rows)
+        self.pending_header = None
+
+    def write_rows(self, start_row: int, rows: List[List[str]]):
+        """Write rows from start_row in one request, growing the grid and adding the pending header"""
+        sheet_id = self.worksheet.id
+        last_row = start_row + len(rows) - 1
+        requests_body = []
+        grow_columns = self._grow_columns(rows)
+        if grow_columns:
+            requests_body.append(grow_columns)
+        if last_row > self.row_count:
+            # Writing past the last row of the grid is rejected
+            requests_body.append({'appendDimension': {
+                'sheetId': sheet_id, 'dimension': 'ROWS', 'length': last_row - self.row_count
+            }})
+        if self.pending_header:
+            requests_body.append(self._update_cells(sheet_id, 1, [self.pending_header]))
+        requests_body.append(self._update_cells(sheet_id, start_row, rows))
+
+        self.call(self.spreadsheet.batch_update, {'requests': requests_body})
+        self.row_count = max(self.row_count, last_row)
+        self.col_count = max(self.col_count, self._width(rows))
+        self.pending_header = None
+
+    def _width(self, rows: List[List[str]]) -> int:
+        return max([len(self.pending_header or [])] + [len(row) for row in rows])
+
+    def _grow_columns(self, rows: List[List[str]]) -> Optional[dict]:
+        """appendDimension request widening the grid to fit rows, if it is too narrow"""
+        width = self._width(rows)
+        if width <= self.col_count:
+            return None
+        return {'appendDimension': {
+            'sheetId': self.worksheet.id, 'dimension': 'COLUMNS', 'length': width - self.col_count
+        }}
+
+    @staticmethod
+    def _update_cells(sheet_id: int, row: int, rows: List[List[str]]) -> dict:
+        """updateCells request writing rows as raw strings from column A of a 1-based row"""
+        return {'updateCells': {
+            'start': {'sheetId': sheet_id, 'rowIndex': row - 1, 'columnIndex': 0},
+            'rows': [{'values': [{'userEnteredValue': {'stringValue': str(value)}} for value in row_values]}
+                     for row_values in rows],
+            'fields': 'userEnteredValue'
+        }}
@@ -0,0 +1,92 @@
+"""
+Background Google Sheets export that runs while generation continues
+"""
+
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from sheets_sync import SheetsSyncState
+
+_STOP = object()
+
+
+class SheetsExportPipeline:
+    """
+    Takes saved conversation sets from a queue and writes them to a worksheet
+    in chunks, flushing when a chunk is full or has waited flush_interval seconds
+
+    Every written chunk is recorded in the sync state, so sets a failed chunk
+    did not write are picked up by the incremental export at the end of the run.
+    """
+
+    def __init__(self, exporter: Any, start_row: int, sync_state: SheetsSyncState,
+                 chunk_size: int = 500, flush_interval: float = 30.0):
+        """
+        Start the export thread
+
+        Args:
+            exporter: GoogleSheetsExporter used to build and write rows, with its worksheet opened
+            start_row: Configured first data row (1 = append after existing data)
+            sync_state: Sync watermark of the target worksheet
+            chunk_size: Rows per Sheets API request
+            flush_interval: Longest time a saved set waits before it is written
+        """
+        self.exporter = exporter
+        self.start_row = start_row
+        self.next_row = start_row if start_row == 1 else max(start_row, sync_state.next_row or start_row)
+        self.sync_state = sync_state
+        self.chunk_size = max(1, chunk_size)
+        self.flush_interval = flush_interval
+        self.exported = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sheets-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, data: Dict[str, Any], location: str):
+        """Queue a conversation set saved to the dataset store for export"""
+        self._queue.put((data, location))
+
+    def close(self):
+        """Write everything still queued and stop the export thread"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        rows: List[List[str]] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                data, location = item
+                if not self.sync_state.is_exported(data['id']):
+                    rows.append(self.exporter.build_row(self.exporter.parse_dataset_entry(data, location)))
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if rows and (len(rows) >= self.chunk_size or due or item is _STOP):
+                self._flush(rows)
+                rows = []
+                deadline = None
+            if item is _STOP:
+                return
+
+    def _flush(self, rows: List[List[str]]):
+        try:
+            self.next_row = self.exporter.write_rows(rows, self.next_row, self.sync_state, self.chunk_size)
+            self.exported += len(rows)
+        except Exception as e:
+            # Left unrecorded in the sync state, so the final export retries them
+            self.failed += len(rows)
+            if self.start_row != 1 and self.sync_state.next_row:
+                # Chunks written before the failure moved the watermark
+                self.next_row = max(self.next_row, self.sync_state.next_row)
+            print(f"⚠️  Streaming Sheets export of {len(rows)} rows failed, will retry at the end: {e}")
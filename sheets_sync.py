@@ -0,0 +1,68 @@
+"""
+Sync watermark for incremental Google Sheets exports
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional
+
+from file_writer import atomic_write
+
+
+SYNC_STATE_FILENAME = "sheets_sync_state.json"
+
+
+class SheetsSyncState:
+    """
+    Remembers which conversation sets were already exported to a worksheet
+    and the next free row, so later exports only send new sets
+
+    One state file can track several spreadsheet/worksheet targets.
+    """
+
+    def __init__(self, path: Path, spreadsheet: str, worksheet: str):
+        """
+        Load the state of one export target
+
+        Args:
+            path: The JSON state file
+            spreadsheet: URL or ID of the spreadsheet
+            worksheet: Name of the worksheet
+        """
+        self.path = Path(path)
+        self.key = f"{spreadsheet}|{worksheet}"
+        self._targets: Dict[str, Any] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    self._targets = json.load(file).get('targets', {})
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"⚠️  Ignoring unreadable sync state {self.path}: {e}")
+
+        target = self._targets.get(self.key, {})
+        self.exported_ids = set(target.get('exported_ids', []))
+        self.next_row: Optional[int] = target.get('next_row')
+        self.turn_columns: Optional[int] = target.get('turn_columns')  # Column layout of the written rows
+
+    def is_exported(self, set_id: str) -> bool:
+        return set_id in self.exported_ids
+
+    def mark_exported(self, set_ids: Iterable[str], next_row: Optional[int] = None):
+        """Record a successfully written chunk and save the state right away"""
+        self.exported_ids.update(set_ids)
+        if next_row is not None:
+            self.next_row = next_row
+        self._targets[self.key] = {
+            'exported_ids': sorted(self.exported_ids),
+            'next_row': self.next_row,
+            'turn_columns': self.turn_columns
+        }
+        atomic_write(self.path, json.dumps({'targets': self._targets}, indent=2))
+
+    def reset(self):
+        """Forget this target so the next export sends every set again"""
+        self.exported_ids = set()
+        self.next_row = None
+        self.turn_columns = None
+        self._targets.pop(self.key, None)
+        atomic_write(self.path, json.dumps({'targets': self._targets}, indent=2))
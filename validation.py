@@ -0,0 +1,67 @@
+"""
+Checks generated conversation sets against the constraints of the prompt
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+
+from conversation_parser import ConversationSetRecord
+
+
+class SetValidator:
+    """
+    Rules every saved set must meet
+
+    Only what the text shows can be checked: turn counts, the tools each
+    turn lists and whether those tools are available. Argument counts of
+    individual calls are not part of the generated text.
+    """
+
+    def __init__(self, min_turns: int = 6, min_tools_per_turn: int = 4,
+                 allowed_tools: Optional[List[str]] = None):
+        """
+        Initialize the validator
+
+        Args:
+            min_turns: Fewest turns a set may have
+            min_tools_per_turn: Fewest tool calls each turn must list
+            allowed_tools: Tools a set may use (None = any tool)
+        """
+        self.min_turns = min_turns
+        self.min_tools_per_turn = min_tools_per_turn
+        self.allowed_tools = {tool.lower() for tool in allowed_tools} if allowed_tools is not None else None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['SetValidator']:
+        """Create the validator from generation.validation, or None if it is disabled"""
+        settings = config['generation'].get('validation') or {}
+        if not settings.get('enabled', False):
+            return None
+        return cls(
+            min_turns=settings.get('min_turns', 6),
+            min_tools_per_turn=settings.get('min_tools_per_turn', 4),
+            allowed_tools=config.get('available_tools', []) if settings.get('allowed_tools_only', True) else None
+        )
+
+    def validate(self, record: ConversationSetRecord) -> List[Tuple[str, str]]:
+        """
+        Check a set against every rule
+
+        Returns:
+            (rule, description) for each rule the set breaks; empty if it is valid
+        """
+        violations = []
+        if len(record.turns) < self.min_turns:
+            violations.append(('min_turns', f"{len(record.turns)} turns (minimum {self.min_turns})"))
+
+        short_turns = [number for number, turn in enumerate(record.turns, 1)
+                       if len(turn.tools) < self.min_tools_per_turn]
+        if short_turns:
+            violations.append(('min_tools_per_turn', f"turns {', '.join(map(str, short_turns))} list fewer "
+                                                     f"than {self.min_tools_per_turn} tool calls"))
+
+        if self.allowed_tools is not None:
+            unknown = sorted({tool for turn in record.turns for tool in turn.tools
+                              if tool.lower() not in self.allowed_tools})
+            if unknown:
+                violations.append(('allowed_tools', f"unavailable tools {', '.join(unknown)}"))
+        return violations